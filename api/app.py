@@ -1,122 +1,750 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, has_request_context, request, jsonify, stream_with_context
 from flask_cors import CORS
+from werkzeug.exceptions import HTTPException
+import functools
+import hmac
+import io
 import os
+import json
+import time
 import traceback
+from datetime import datetime
 import joblib
+import numpy as np
 import pandas as pd
-from datetime import datetime
+from staffing_table import load_staffing_table, check_staffing_table, staffing_grid
+from service_grid import load_service_grid, lookup_minutes, grid_minutes
+from prediction_cache import PredictionCache
+from model_registry import ModelRegistry
+from compiled_model import load_compiled
+from metrics import MetricsRegistry, StageTimer, NULL_TIMER
+from micro_batcher import MicroBatcher
+from profiling import SamplingProfiler, SlowRequestLog, ProfilerBusy, MAX_PROFILE_SECONDS, collapsed, summarize_inputs
+from feature_pipeline import FeaturePipeline, FeatureError, calendar_cache, OK, UNKNOWN_TASK, INVALID_DATE, INVALID_TIME, UNKNOWN_TO_MODEL
+from workload_planner import plan_workload, summarize as summarize_plan, UNDER_STAFFED_UTILIZATION, OVER_STAFFED_UTILIZATION
 
 # Paths to model folders
 TASK1_MODEL_DIR = os.path.join(os.path.dirname(__file__), '../Model/Tast1')
 TASK2_MODEL_DIR = os.path.join(os.path.dirname(__file__), '../Model/Task2')
+TASKS_FILE = os.path.join(os.path.dirname(__file__), 'datasets/tasks.csv')
+
+# Set STAFFING_TABLE_CHECK=1 to also run the live model per request and log disagreements
+STAFFING_TABLE_CHECK = os.environ.get('STAFFING_TABLE_CHECK', '0') == '1'
+
+# SERVICE_TIME_GRID=1 answers service time predictions with the placeholder staffing features from
+# the precomputed (hour, weekday, month, task) grid. Those requests then skip the prediction cache,
+# the micro-batcher and the compiled engine, which only apply to rows that reach the model.
+SERVICE_TIME_GRID = os.environ.get('SERVICE_TIME_GRID', '0') == '1'
+
+# Number of NDJSON lines scored per vectorized chunk when streaming
+BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', 10000))
+
+# Seconds between checks for a newly activated model version (0 disables hot reload)
+MODEL_POLL_INTERVAL = float(os.environ.get('MODEL_POLL_INTERVAL', 30))
+
+# INFERENCE_ENGINE=compiled scores small inputs with the NumPy tree export (scaler folded in),
+# avoiding the XGBoost wrapper/DMatrix overhead; larger batches still use model.predict,
+# which is faster beyond a few dozen rows.
+INFERENCE_ENGINE = os.environ.get('INFERENCE_ENGINE', 'xgboost')
+COMPILED_MAX_ROWS = int(os.environ.get('COMPILED_MAX_ROWS', 64))
+
+# MICRO_BATCH_WINDOW_MS > 0 coalesces concurrent single service predictions (cache misses) into
+# one model call per window, flushing early once MICRO_BATCH_MAX_SIZE rows are queued.
+# Use with a threaded or async worker; a sync worker never has concurrent requests to group.
+MICRO_BATCH_WINDOW_MS = float(os.environ.get('MICRO_BATCH_WINDOW_MS', 0))
+MICRO_BATCH_MAX_SIZE = int(os.environ.get('MICRO_BATCH_MAX_SIZE', 64))
+# A request whose row the batcher has not scored within this many ms scores it itself
+MICRO_BATCH_TIMEOUT_MS = float(os.environ.get('MICRO_BATCH_TIMEOUT_MS', 1000))
+
+# Longest date range accepted by /forecast_staffing, and days per chunk when streaming CSV/NDJSON
+FORECAST_MAX_DAYS = int(os.environ.get('FORECAST_MAX_DAYS', 3660))
+FORECAST_CHUNK_DAYS = int(os.environ.get('FORECAST_CHUNK_DAYS', 92))
+
+# /admin endpoints (profiler, slow request log) answer only requests carrying this token in
+# X-Admin-Token; without ADMIN_TOKEN they are disabled (404)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
 
-# Load Task 1 (Service Completion Time) model and encoders
-service_model = joblib.load(os.path.join(TASK1_MODEL_DIR, 'xgb_service_completion_model.pkl'))
-service_scaler = joblib.load(os.path.join(TASK1_MODEL_DIR, 'scaler.pkl'))
-service_le_task = joblib.load(os.path.join(TASK1_MODEL_DIR, 'task_label_encoder.pkl'))
-service_le_section = joblib.load(os.path.join(TASK1_MODEL_DIR, 'section_label_encoder.pkl'))
-service_task_df = pd.read_csv(os.path.join(os.path.dirname(__file__), 'datasets/tasks.csv'))
+# Requests at or above SLOW_REQUEST_MS (0 disables) are kept, with inputs and stage timings, in a
+# ring buffer of the last SLOW_REQUEST_BUFFER entries, readable at /admin/slow_requests
+SLOW_REQUEST_MS = float(os.environ.get('SLOW_REQUEST_MS', 250))
+SLOW_REQUEST_BUFFER = int(os.environ.get('SLOW_REQUEST_BUFFER', 200))
 
-# Load Task 2 (Staffing Needs) model and encoders
-staffing_model = joblib.load(os.path.join(TASK2_MODEL_DIR, 'xgb_staffing_model.pkl'))
-staffing_scaler = joblib.load(os.path.join(TASK2_MODEL_DIR, 'scaler.pkl'))
-staffing_le_section = joblib.load(os.path.join(TASK2_MODEL_DIR, 'section_label_encoder.pkl'))
+def load_service_bundle(version, model_dir):
+    """Loads Task 1 (Service Completion Time) model, encoders and tasks table, then warms it up."""
+    le_task = joblib.load(os.path.join(model_dir, 'task_label_encoder.pkl'))
+    le_section = joblib.load(os.path.join(model_dir, 'section_label_encoder.pkl'))
+    task_df = pd.read_csv(TASKS_FILE)
+    bundle = {
+        'version': version,
+        'model': joblib.load(os.path.join(model_dir, 'xgb_service_completion_model.pkl')),
+        'scaler': joblib.load(os.path.join(model_dir, 'scaler.pkl')),
+        'le_task': le_task,
+        'le_section': le_section,
+        'task_df': task_df,
+        # Lookup tables (built once, replaces per-row scans and LabelEncoder calls)
+        'task_sections': dict(zip(task_df['task_id'], task_df['section_id'])),
+        'task_codes': {label: code for code, label in enumerate(le_task.classes_)},
+        'section_codes': {label: code for code, label in enumerate(le_section.classes_)},
+    }
+    bundle['features'] = FeaturePipeline(bundle['task_sections'], bundle['task_codes'], bundle['section_codes'])
+    if SERVICE_TIME_GRID:
+        bundle['grid'] = load_service_grid(model_dir, bundle['model'], bundle['scaler'], bundle['features'])
+    if INFERENCE_ENGINE == 'compiled':
+        bundle['compiled'] = load_compiled(model_dir, bundle['model'], bundle['scaler'])
+    # Warm-up: the first predict on a fresh booster is much slower than the rest
+    predict_raw(bundle, np.zeros((1, bundle['scaler'].n_features_in_)))
+    return bundle
+
+def load_staffing_bundle(version, model_dir):
+    """Loads Task 2 (Staffing Needs) model, encoder and precomputed forecast table."""
+    model = joblib.load(os.path.join(model_dir, 'xgb_staffing_model.pkl'))
+    scaler = joblib.load(os.path.join(model_dir, 'scaler.pkl'))
+    le_section = joblib.load(os.path.join(model_dir, 'section_label_encoder.pkl'))
+    # Every staffing prediction precomputed as (month, weekday, section_id) -> employee count
+    table = load_staffing_table(model_dir, model, scaler, le_section)
+    if STAFFING_TABLE_CHECK:
+        mismatches = check_staffing_table(table, model, scaler, le_section)
+        if mismatches:
+            print(f"Staffing table {version} disagrees with the model on {len(mismatches)} keys, e.g. {mismatches[:3]}")
+    bundle = {
+        'version': version,
+        'model': model,
+        'scaler': scaler,
+        'le_section': le_section,
+        'section_codes': {label: code for code, label in enumerate(le_section.classes_)},
+        'table': table,
+        # Same table as a [month - 1, weekday, section code] array for date-range forecasts
+        'grid': staffing_grid(table, le_section.classes_),
+    }
+    if INFERENCE_ENGINE == 'compiled':
+        bundle['compiled'] = load_compiled(model_dir, model, scaler)
+    return bundle
+
+def predict_raw(bundle, X, timer=NULL_TIMER):
+    """Model output for unscaled feature rows, via the compiled ensemble for small inputs when enabled."""
+    if 'compiled' in bundle and len(X) <= COMPILED_MAX_ROWS:
+        preds = bundle['compiled'].predict(X)
+        timer.mark('predict')
+        return preds
+    X_scaled = bundle['scaler'].transform(X)
+    timer.mark('scale')
+    preds = bundle['model'].predict(X_scaled)
+    timer.mark('predict')
+    return preds
+
+service_registry = ModelRegistry(TASK1_MODEL_DIR, load_service_bundle)
+staffing_registry = ModelRegistry(TASK2_MODEL_DIR, load_staffing_bundle)
+
+# Request counts, error counts and per-stage latency histograms for /metrics
+metrics = MetricsRegistry()
+
+profiler = SamplingProfiler()
+slow_requests = SlowRequestLog(SLOW_REQUEST_MS, SLOW_REQUEST_BUFFER)
+
+# Not timed: scraping and admin calls would skew the latency histograms and the slow request log
+_UNTIMED_ENDPOINTS = {'prometheus_metrics', 'admin_profile', 'admin_slow_requests'}
+
+# LRU cache of service time predictions keyed on the engineered feature vector.
+# Entries are tagged with the model version, so a hot-reloaded model invalidates them.
+prediction_cache = PredictionCache(maxsize=int(os.environ.get('PREDICTION_CACHE_SIZE', 4096)))
+
+def _score_service_rows(bundle, rows):
+    return [max(1, round(pred)) for pred in predict_raw(bundle, np.array(rows, dtype=float))]
+
+micro_batcher = None
+if MICRO_BATCH_WINDOW_MS > 0:
+    micro_batcher = MicroBatcher(_score_service_rows, MICRO_BATCH_WINDOW_MS, MICRO_BATCH_MAX_SIZE, metrics,
+                                 timeout_ms=MICRO_BATCH_TIMEOUT_MS)
 
 app = Flask(__name__)
 CORS(app, supports_credentials=True, origins=["http://localhost:3000"])
 
+service_registry.logger = app.logger
+staffing_registry.logger = app.logger
+
+def start_background_threads():
+    """Starts the model pollers and the micro-batcher. Threads do not survive fork, so a preloading
+    server (see gunicorn.conf.py) calls this in each worker instead of at import."""
+    service_registry.start(MODEL_POLL_INTERVAL)
+    staffing_registry.start(MODEL_POLL_INTERVAL)
+    if micro_batcher is not None:
+        micro_batcher.start()
+
+if os.environ.get('START_BACKGROUND_THREADS', '1') == '1':
+    start_background_threads()
+
+@app.before_request
+def _start_timer():
+    g.timer = StageTimer()
+
+@app.after_request
+def _record_metrics(response):
+    timer = g.get('timer')
+    if timer is not None and request.endpoint not in _UNTIMED_ENDPOINTS:
+        # Everything after the last mark (jsonify and response building) counts as serialization
+        timer.mark('serialize')
+        error_type = g.get('error_type')
+        if error_type is None and response.status_code >= 400:
+            error_type = f"http_{response.status_code}"
+        metrics.observe_request(request.endpoint or 'unknown', response.status_code, timer.stages, error_type)
+        duration_ms = sum(timer.stages.values()) * 1000
+        if slow_requests.is_slow(duration_ms):
+            _capture_slow_request(response, timer, duration_ms, error_type)
+    return response
+
+def _capture_slow_request(response, timer, duration_ms, error_type):
+    # Streamed bodies (NDJSON) were consumed by the handler and are not kept
+    inputs = None if _is_ndjson() else summarize_inputs(request.get_json(force=True, silent=True))
+    features = g.get('features')
+    slow_requests.record({
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'error_type': error_type,
+        'duration_ms': round(duration_ms, 3),
+        'stages_ms': timer.as_ms(),
+        'inputs': inputs,
+        'features': list(features) if features is not None else None,
+        'models': {'service_time': service_registry.version, 'staffing': staffing_registry.version},
+    })
+
+class RequestError(Exception):
+    """A request rejected by validation: answered with {'error', 'code'} and counted under code."""
+    def __init__(self, code, message, status=400, field=None):
+        super().__init__(message)
+        self.code = code
+        self.status = status
+        self.field = field
+
+# Error codes for inputs the feature pipeline rejects
+# FeaturePipeline row status -> (error code, field at fault), shared by single and batch endpoints
+_FEATURE_ERROR_CODES = {
+    UNKNOWN_TASK: ('invalid_task_id', 'task_id'),
+    INVALID_DATE: ('invalid_date', 'date'),
+    INVALID_TIME: ('invalid_time', 'time'),
+    UNKNOWN_TO_MODEL: ('unknown_to_model', None),
+}
+
+def _request_error(code, message, status=400, field=None):
+    g.error_type = code
+    body = {'error': message, 'code': code}
+    if field is not None:
+        body['field'] = field
+    return jsonify(body), status
+
+def _error_response(e):
+    """
+    Response for an exception from a handler. Bad input (RequestError, FeatureError, HTTP errors)
+    gets a structured 4xx without a stack trace. Anything else is a 500, logged with its traceback,
+    and the trace is returned in the body only when the app runs in debug mode.
+    """
+    if isinstance(e, RequestError):
+        return _request_error(e.code, str(e), e.status, e.field)
+    if isinstance(e, FeatureError):
+        code, field = _FEATURE_ERROR_CODES[e.status]
+        return _request_error(code, str(e), field=field)
+    if isinstance(e, HTTPException):
+        return _request_error(f"http_{e.code}", e.description, e.code)
+    g.error_type = type(e).__name__
+    app.logger.exception("Unhandled error in %s", request.endpoint)
+    body = {'error': str(e), 'code': 'internal_error'}
+    if app.debug:
+        body['trace'] = traceback.format_exc()
+    return jsonify(body), 500
+
+def _json_object():
+    """The request body as a dict; raises RequestError for invalid JSON or a non-object body."""
+    data = request.get_json(force=True, silent=True)
+    g.timer.mark('json_parse')
+    if not isinstance(data, dict):
+        raise RequestError('invalid_request_format', 'Request body must be a JSON object')
+    return data
+
+def _require_strings(data, fields):
+    for field in fields:
+        value = data.get(field)
+        if not isinstance(value, str) or not value:
+            code = 'missing_field' if value is None else 'invalid_field'
+            raise RequestError(code, f"{field} is required and must be a non-empty string", field=field)
+
+def validate_service_request(bundle, data):
+    """
+    (date, time, task_id) from a request body, checked before any feature or model work: field
+    types first, then task_id against the tasks.csv keys. Dates and times are checked next by
+    FeaturePipeline.service_row, which raises FeatureError.
+    """
+    _require_strings(data, ('date', 'time', 'task_id'))
+    if data['task_id'] not in bundle['task_sections']:
+        raise RequestError('invalid_task_id', 'Invalid task_id', field='task_id')
+    return data['date'], data['time'], data['task_id']
+
+def validate_staffing_request(bundle, data):
+    """(date, section_id) from a request body, with section_id checked against the model's sections."""
+    _require_strings(data, ('date', 'section_id'))
+    if data['section_id'].upper() not in bundle['section_codes']:
+        raise RequestError('invalid_section_id', 'Invalid section_id', field='section_id')
+    return data['date'], data['section_id']
+
 @app.route('/predict_service_time', methods=['POST'])
 def predict_service_time():
     try:
-        data = request.get_json(force=True)
-        date = data['date']
-        time_str = data['time']
-        task_id = data['task_id']
-        # Get section_id from tasks.csv
-        row = service_task_df[service_task_df['task_id'] == task_id]
-        if row.empty:
-            return jsonify({'error': 'Invalid task_id'}), 400
-        section_id = row.iloc[0]['section_id']
-        # Feature engineering
-        date_dt = pd.to_datetime(date)
-        hour = int(time_str.split(':')[0])
-        weekday = date_dt.weekday()
-        month = date_dt.month
-        task_id_encoded = service_le_task.transform([task_id])[0]
-        section_id_encoded = service_le_section.transform([section_id])[0]
-        # Dummy values for staff_load_ratio and employees_on_duty (could be improved)
-        staff_load_ratio = 1.0
-        employees_on_duty = 1.0
-        X = [[hour, weekday, month, task_id_encoded, section_id_encoded, staff_load_ratio, employees_on_duty]]
-        X_scaled = service_scaler.transform(X)
-        pred = service_model.predict(X_scaled)[0]
-        return jsonify({'expected_completion_time_minutes': max(1, round(pred))})
+        bundle = service_registry.current()
+        date, time_str, task_id = validate_service_request(bundle, _json_object())
+        minutes = predict_service_minutes(bundle, date, time_str, task_id, g.timer)
+        return jsonify({'expected_completion_time_minutes': minutes})
     except Exception as e:
-        return jsonify({'error': str(e), 'trace': traceback.format_exc()}), 500
+        return _error_response(e)
+
+def service_features(bundle, date, time_str, task_id, timer=NULL_TIMER):
+    """Engineered Task 1 feature tuple, or None when task_id is not in tasks.csv."""
+    # Placeholder staff_load_ratio and employees_on_duty; see FeaturePipeline.service_row
+    features = bundle['features'].service_row(date, time_str, task_id, timer=timer)
+    timer.mark('encode')
+    if has_request_context():
+        # Kept for the slow request log
+        g.features = features
+    return features
+
+def _score_service(bundle, features, timer=NULL_TIMER):
+    pred = predict_raw(bundle, np.array([features], dtype=float), timer)[0]
+    return max(1, round(pred))
+
+def predict_service_minutes(bundle, date, time_str, task_id, timer=NULL_TIMER):
+    """Predicted completion time in minutes, served from the LRU cache when possible."""
+    features = service_features(bundle, date, time_str, task_id, timer)
+    if features is None:
+        return None
+    if 'grid' in bundle:
+        minutes = lookup_minutes(bundle['grid'], features)
+        if minutes is not None:
+            timer.mark('lookup')
+            return minutes
+    minutes = prediction_cache.get(features, bundle['version'])
+    timer.mark('cache')
+    if minutes is None:
+        if micro_batcher is not None:
+            minutes = micro_batcher.submit(bundle, features)
+            timer.mark('micro_batch')
+        else:
+            minutes = _score_service(bundle, features, timer)
+        prediction_cache.put(features, minutes, bundle['version'])
+    return minutes
+
+def _calendar(date):
+    """Returns (month, weekday) for a date string from the shared memoized calendar."""
+    calendar = calendar_cache.get(date)
+    if calendar is None:
+        raise FeatureError(INVALID_DATE, f"Invalid date {date!r}")
+    return calendar[0], calendar[1]
+
+def _live_staffing(bundle, month, weekday, section_id):
+    X = np.array([[month, weekday, bundle['section_codes'][section_id]]], dtype=float)
+    pred = predict_raw(bundle, X)[0]
+    return max(1, round(pred))
+
+def lookup_staffing(bundle, date, section_id, timer=NULL_TIMER):
+    """Predicted employee count from the precomputed table, or None for an unknown section."""
+    month, weekday = _calendar(date)
+    timer.mark('date_parse')
+    key = (month, weekday, section_id.upper())
+    count = bundle['table'].get(key)
+    timer.mark('lookup')
+    if STAFFING_TABLE_CHECK and count is not None:
+        live = _live_staffing(bundle, *key)
+        if live != count:
+            app.logger.warning("Staffing table mismatch for %s: table=%s model=%s", key, count, live)
+    return count
 
 @app.route('/predict_staffing', methods=['POST'])
 def predict_staffing():
     try:
-        data = request.get_json(force=True)
-        date = data['date']
-        section_id = data['section_id'].upper()
-        date_dt = pd.to_datetime(date)
-        month = date_dt.month
-        weekday = date_dt.weekday()
-        section_id_encoded = staffing_le_section.transform([section_id])[0]
-        X = [[month, weekday, section_id_encoded]]
-        X_scaled = staffing_scaler.transform(X)
-        pred = staffing_model.predict(X_scaled)[0]
-        return jsonify({'predicted_employee_count': max(1, round(pred))})
+        bundle = staffing_registry.current()
+        date, section_id = validate_staffing_request(bundle, _json_object())
+        return jsonify({'predicted_employee_count': lookup_staffing(bundle, date, section_id, g.timer)})
     except Exception as e:
-        return jsonify({'error': str(e), 'trace': traceback.format_exc()}), 500
+        return _error_response(e)
+
+# Placeholder for NDJSON lines that failed to parse
+_INVALID_JSON = object()
+
+def _item_error(code, message, field=None):
+    """Inline error for one batch item, with the same code and field as the single-item endpoint."""
+    error = {'error': message, 'code': code}
+    if field is not None:
+        error['field'] = field
+    return error
+
+def _batch_results(items, required):
+    """
+    Return (results, valid_positions) with inline errors for malformed items. Fields are checked
+    with the single-row rules (_require_strings), so a list, number or null never reaches the
+    scorer and one bad item cannot fail the batch or cut off a stream.
+    """
+    results = [None] * len(items)
+    valid = []
+    for i, item in enumerate(items):
+        if item is _INVALID_JSON:
+            results[i] = _item_error('invalid_request_format', 'Invalid JSON line')
+            continue
+        if not isinstance(item, dict):
+            results[i] = _item_error('invalid_request_format', 'Item must be a JSON object')
+            continue
+        try:
+            _require_strings(item, required)
+        except RequestError as e:
+            results[i] = _item_error(e.code, str(e), e.field)
+            continue
+        valid.append(i)
+    return results, valid
+
+# Batch error messages per FeaturePipeline status code
+_SERVICE_ERRORS = {
+    UNKNOWN_TASK: 'Invalid task_id',
+    INVALID_DATE: 'Invalid date',
+    INVALID_TIME: 'Invalid time',
+    UNKNOWN_TO_MODEL: 'Unknown task_id or section_id for the loaded model',
+}
+
+def score_service_batch(bundle, items, timer=NULL_TIMER):
+    """Score a list of {date, time, task_id} dicts with one scaler/model call."""
+    results, valid = _batch_results(items, ('date', 'time', 'task_id'))
+    rows = []
+    if valid:
+        # Placeholder staffing features, as in /predict_service_time
+        features, status = bundle['features'].service_matrix([items[i]['date'] for i in valid],
+                                                             [items[i]['time'] for i in valid],
+                                                             [items[i]['task_id'] for i in valid])
+        timer.mark('encode')
+        for i, code in zip(valid, status.tolist()):
+            if code == OK:
+                rows.append(i)
+            else:
+                error_code, field = _FEATURE_ERROR_CODES[code]
+                results[i] = _item_error(error_code, _SERVICE_ERRORS[code], field)
+    if rows:
+        if 'grid' in bundle:
+            all_minutes = grid_minutes(bundle['grid'], features, lambda X: predict_raw(bundle, X, timer))
+            timer.mark('lookup')
+        else:
+            all_minutes = np.maximum(1, np.round(predict_raw(bundle, features, timer))).astype(int)
+        for i, minutes in zip(rows, all_minutes):
+            results[i] = {'expected_completion_time_minutes': int(minutes)}
+    return _with_row_ids(items, results)
+
+def score_staffing_batch(bundle, items, timer=NULL_TIMER):
+    """Score a list of {date, section_id} dicts from the precomputed staffing table."""
+    results, valid = _batch_results(items, ('date', 'section_id'))
+    if valid:
+        months, weekdays, valid_dates = calendar_cache.lookup([items[i]['date'] for i in valid])
+        timer.mark('date_parse')
+        for pos, i in enumerate(valid):
+            section_id = items[i]['section_id'].upper()
+            if section_id not in bundle['section_codes']:
+                results[i] = _item_error('invalid_section_id', 'Invalid section_id', 'section_id')
+            elif not valid_dates[pos]:
+                results[i] = _item_error('invalid_date', 'Invalid date', 'date')
+            else:
+                results[i] = {'predicted_employee_count': bundle['table'][(int(months[pos]), int(weekdays[pos]), section_id)]}
+        timer.mark('lookup')
+    return _with_row_ids(items, results)
+
+def _with_row_ids(items, results):
+    # Echo caller supplied row ids so results can be joined back to the inputs
+    for item, result in zip(items, results):
+        if isinstance(item, dict) and 'row_id' in item:
+            result['row_id'] = item['row_id']
+    return results
+
+def _is_ndjson():
+    return request.mimetype in ('application/x-ndjson', 'application/jsonl', 'application/json-seq')
+
+def _ndjson_chunks():
+    """Yield lists of parsed NDJSON items of at most BATCH_CHUNK_SIZE from the request stream."""
+    chunk = []
+    for line in request.stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            chunk.append(json.loads(line))
+        except ValueError:
+            chunk.append(_INVALID_JSON)
+        if len(chunk) >= BATCH_CHUNK_SIZE:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _batch_response(scorer, registry):
+    # The whole batch (or NDJSON stream) is scored by the bundle active when it arrived
+    bundle = registry.current()
+    if _is_ndjson():
+        # Streamed responses finish after after_request, so their stages are not timed
+        def generate():
+            for chunk in _ndjson_chunks():
+                for result in scorer(bundle, chunk):
+                    yield json.dumps(result) + '\n'
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    data = request.get_json(force=True, silent=True)
+    g.timer.mark('json_parse')
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return _request_error('invalid_batch', 'Expected a JSON array or an object with an "items" array')
+    results = scorer(bundle, items, g.timer)
+    return jsonify({'predictions': results, 'count': len(results),
+                    'errors': sum(1 for r in results if 'error' in r)})
+
+@app.route('/predict_service_time/batch', methods=['POST'])
+def predict_service_time_batch():
+    try:
+        return _batch_response(score_service_batch, service_registry)
+    except Exception as e:
+        return _error_response(e)
+
+@app.route('/predict_staffing/batch', methods=['POST'])
+def predict_staffing_batch():
+    try:
+        return _batch_response(score_staffing_batch, staffing_registry)
+    except Exception as e:
+        return _error_response(e)
+
+def staffing_forecast(bundle, start, end, sections):
+    """Employee counts for every day in [start, end] and every section, as a (days, sections) array."""
+    dates = pd.date_range(start, end, freq='D')
+    codes = [bundle['section_codes'][section_id] for section_id in sections]
+    counts = bundle['grid'][dates.month.to_numpy() - 1, dates.weekday.to_numpy()][:, codes]
+    return dates, counts
+
+def _forecast_args():
+    """start_date, end_date, sections and format from the JSON body or the query string."""
+    data = request.get_json(silent=True) if request.method == 'POST' else None
+    if not isinstance(data, dict):
+        data = request.args.to_dict()
+    sections = data.get('sections')
+    if isinstance(sections, str):
+        sections = [s for s in sections.split(',') if s.strip()]
+    return data.get('start_date'), data.get('end_date'), sections, str(data.get('format', 'json')).lower()
+
+def _iso_date(value, field):
+    """A YYYY-MM-DD string as a Timestamp; anything else (numbers, other formats) raises RequestError."""
+    if isinstance(value, str) and len(value) == 10:
+        try:
+            return pd.Timestamp(datetime.strptime(value, '%Y-%m-%d'))
+        except ValueError:
+            pass
+    raise RequestError('invalid_date', f"{field} must be a date string in YYYY-MM-DD format", field=field)
+
+def _forecast_chunks(bundle, start, end, sections):
+    for chunk_start in pd.date_range(start, end, freq=f"{FORECAST_CHUNK_DAYS}D"):
+        chunk_end = min(chunk_start + pd.Timedelta(days=FORECAST_CHUNK_DAYS - 1), end)
+        yield staffing_forecast(bundle, chunk_start, chunk_end, sections)
+
+@app.route('/forecast_staffing', methods=['GET', 'POST'])
+def forecast_staffing():
+    try:
+        bundle = staffing_registry.current()
+        start_date, end_date, sections, fmt = _forecast_args()
+        g.timer.mark('json_parse')
+        if start_date is None or end_date is None:
+            return _request_error('invalid_request_format', 'start_date and end_date are required')
+        start, end = _iso_date(start_date, 'start_date'), _iso_date(end_date, 'end_date')
+        g.timer.mark('date_parse')
+        if end < start:
+            return _request_error('invalid_date_range', 'end_date is before start_date')
+        days = (end - start).days + 1
+        if days > FORECAST_MAX_DAYS:
+            return _request_error('invalid_date_range', f"Date range of {days} days exceeds the limit of {FORECAST_MAX_DAYS}")
+        if fmt not in ('json', 'csv', 'ndjson'):
+            return _request_error('invalid_request_format', 'format must be json, csv or ndjson')
+        if sections is None:
+            sections = list(bundle['section_codes'])
+        else:
+            sections = [str(section_id).strip().upper() for section_id in sections]
+            unknown = [section_id for section_id in sections if section_id not in bundle['section_codes']]
+            if unknown:
+                g.error_type = 'invalid_section_id'
+                return jsonify({'error': 'Invalid section_id', 'code': 'invalid_section_id', 'sections': unknown}), 400
+
+        if fmt == 'json':
+            dates, counts = staffing_forecast(bundle, start, end, sections)
+            g.timer.mark('lookup')
+            return jsonify({
+                'model_version': bundle['version'],
+                'dates': dates.strftime('%Y-%m-%d').tolist(),
+                'sections': sections,
+                # One list per section, aligned with dates
+                'predicted_employee_count': {section_id: counts[:, i].tolist() for i, section_id in enumerate(sections)},
+            })
+
+        # CSV and NDJSON are streamed one chunk of days at a time, so long horizons stay flat in memory
+        def generate():
+            if fmt == 'csv':
+                yield 'date,' + ','.join(sections) + '\n'
+            for dates, counts in _forecast_chunks(bundle, start, end, sections):
+                labels = dates.strftime('%Y-%m-%d')
+                if fmt == 'csv':
+                    yield ''.join(f"{label},{','.join(map(str, row))}\n" for label, row in zip(labels, counts.tolist()))
+                else:
+                    yield ''.join(json.dumps({'date': label, 'predicted_employee_count': dict(zip(sections, row))}) + '\n'
+                                  for label, row in zip(labels, counts.tolist()))
+        mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        return Response(stream_with_context(generate()), mimetype=mimetype,
+                        headers={'X-Model-Version': bundle['version']})
+    except Exception as e:
+        return _error_response(e)
+
+def _number_option(options, name, default):
+    """A numeric option from the query string or JSON body; raises RequestError when it is not a number."""
+    value = options.get(name, default)
+    if not isinstance(value, bool):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            pass
+    raise RequestError('invalid_field', f"{name} must be a number", field=name)
+
+@app.route('/plan_workload', methods=['POST'])
+def plan_workload_endpoint():
+    try:
+        service_bundle, staffing_bundle = service_registry.current(), staffing_registry.current()
+        options = request.args.to_dict()
+        if request.mimetype == 'text/csv':
+            try:
+                bookings = pd.read_csv(io.BytesIO(request.get_data()), dtype=str, keep_default_na=False)
+            except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError):
+                return _request_error('invalid_request_format', 'Request body is not a CSV with a header row')
+        else:
+            data = request.get_json(force=True, silent=True)
+            if isinstance(data, dict):
+                options.update({k: v for k, v in data.items() if k != 'bookings'})
+                data = data.get('bookings')
+            if not isinstance(data, list):
+                return _request_error('invalid_request_format', 'Expected a JSON array or an object with a "bookings" array')
+            for i, row in enumerate(data):
+                if not isinstance(row, dict) or not all(isinstance(row.get(f), str) for f in ('date', 'time', 'task_id')):
+                    return _request_error('invalid_request_format',
+                                          f"bookings[{i}] must be an object with string date, time and task_id",
+                                          field='bookings')
+            bookings = pd.DataFrame(data, columns=['date', 'time', 'task_id'])
+        g.timer.mark('json_parse')
+        missing = {'date', 'time', 'task_id'} - set(bookings.columns)
+        if missing:
+            return _request_error('invalid_request_format', f"Missing columns: {', '.join(sorted(missing))}")
+        plan, skipped = plan_workload(bookings, service_bundle, staffing_bundle,
+                                      predict=lambda X: predict_raw(service_bundle, X),
+                                      under=_number_option(options, 'under', UNDER_STAFFED_UTILIZATION),
+                                      over=_number_option(options, 'over', OVER_STAFFED_UTILIZATION))
+        g.timer.mark('predict')
+        if str(options.get('format', 'json')).lower() == 'csv':
+            return Response(plan.to_csv(index=False), mimetype='text/csv')
+        summary = summarize_plan(plan)
+        del summary['flagged']
+        return jsonify({
+            'model_versions': {'service_time': service_bundle['version'], 'staffing': staffing_bundle['version']},
+            'skipped_bookings': skipped,
+            'summary': summary,
+            # Columnar: one list per column, aligned by row
+            'plan': {column: plan[column].tolist() for column in plan.columns},
+        })
+    except Exception as e:
+        return _error_response(e)
 
 @app.route('/predict', methods=['POST'])
 def predict():
     try:
-        data = request.get_json(force=True)
+        data = _json_object()
         # Decide which prediction to run based on keys in data
         if 'task_id' in data and 'date' in data and 'time' in data:
             # Service completion time prediction
-            date = data['date']
-            time_str = data['time']
-            task_id = data['task_id']
-            row = service_task_df[service_task_df['task_id'] == task_id]
-            if row.empty:
-                return jsonify({'error': 'Invalid task_id'}), 400
-            section_id = row.iloc[0]['section_id']
-            date_dt = pd.to_datetime(date)
-            hour = int(time_str.split(':')[0])
-            weekday = date_dt.weekday()
-            month = date_dt.month
-            task_id_encoded = service_le_task.transform([task_id])[0]
-            section_id_encoded = service_le_section.transform([section_id])[0]
-            staff_load_ratio = 1.0
-            employees_on_duty = 1.0
-            X = [[hour, weekday, month, task_id_encoded, section_id_encoded, staff_load_ratio, employees_on_duty]]
-            X_scaled = service_scaler.transform(X)
-            pred = service_model.predict(X_scaled)[0]
-            return jsonify({'expected_completion_time_minutes': max(1, round(pred))})
+            bundle = service_registry.current()
+            date, time_str, task_id = validate_service_request(bundle, data)
+            return jsonify({'expected_completion_time_minutes': predict_service_minutes(bundle, date, time_str, task_id, g.timer)})
         elif 'section_id' in data and 'date' in data and 'staffing' in data:
             # Staffing prediction (expects 'staffing' key to distinguish)
-            date = data['date']
-            section_id = data['section_id'].upper()
-            date_dt = pd.to_datetime(date)
-            month = date_dt.month
-            weekday = date_dt.weekday()
-            section_id_encoded = staffing_le_section.transform([section_id])[0]
-            X = [[month, weekday, section_id_encoded]]
-            X_scaled = staffing_scaler.transform(X)
-            pred = staffing_model.predict(X_scaled)[0]
-            return jsonify({'predicted_employee_count': max(1, round(pred))})
+            bundle = staffing_registry.current()
+            date, section_id = validate_staffing_request(bundle, data)
+            return jsonify({'predicted_employee_count': lookup_staffing(bundle, date, section_id, g.timer)})
         else:
-            return jsonify({'error': 'Invalid request format'}), 400
+            return _request_error('invalid_request_format', 'Invalid request format')
     except Exception as e:
-        return jsonify({'error': str(e), 'trace': traceback.format_exc()}), 500
+        return _error_response(e)
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(prediction_cache.stats())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    metrics.set_info('prediction_model_info', 'Loaded model version per model.', [
+        {'model': 'service_time', 'version': service_registry.version, 'engine': INFERENCE_ENGINE},
+        {'model': 'staffing', 'version': staffing_registry.version, 'engine': INFERENCE_ENGINE},
+    ])
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+def _admin_only(view):
+    """404 unless ADMIN_TOKEN is set, 403 unless the request carries it in X-Admin-Token."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({'error': 'Not found'}), 404
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+            return jsonify({'error': 'Forbidden'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.route('/admin/profile', methods=['GET'])
+@_admin_only
+def admin_profile():
+    """
+    Samples every thread of this worker for ?seconds= (default 10, max MAX_PROFILE_SECONDS) every
+    ?interval_ms= (default 5). Returns collapsed stacks for flamegraph tools, or JSON with ?format=json.
+    The run blocks this request's thread, so a worker that serves one request at a time is refused:
+    it would see no traffic and could be killed by the server's worker timeout.
+    """
+    try:
+        seconds = float(request.args.get('seconds', 10))
+        interval_ms = float(request.args.get('interval_ms', 5))
+    except ValueError:
+        return _request_error('invalid_field', 'seconds and interval_ms must be numbers')
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        return _request_error('invalid_field', f"seconds must be between 0 and {MAX_PROFILE_SECONDS:g}", field='seconds')
+    if not request.environ.get('wsgi.multithread'):
+        return _request_error('single_threaded_worker', 'This worker serves one request at a time and cannot run other '
+                              'requests while profiling; use a threaded server (GUNICORN_THREADS > 1)', 409)
+    try:
+        stacks, passes = profiler.run(seconds, interval_ms / 1000)
+    except ProfilerBusy as e:
+        return _request_error('profiler_busy', str(e), 409)
+    if request.args.get('format') == 'json':
+        return jsonify({'seconds': seconds, 'interval_ms': interval_ms, 'passes': passes,
+                        'stacks': dict(stacks.most_common())})
+    return Response(collapsed(stacks), mimetype='text/plain')
+
+@app.route('/admin/slow_requests', methods=['GET', 'DELETE'])
+@_admin_only
+def admin_slow_requests():
+    """Captured slow requests, newest first (?limit=, ?endpoint=); DELETE empties the buffer."""
+    if request.method == 'DELETE':
+        slow_requests.clear()
+        return jsonify({'cleared': True})
+    entries = slow_requests.entries(request.args.get('limit', type=int), request.args.get('endpoint'))
+    return jsonify({'threshold_ms': slow_requests.threshold_ms, 'capacity': slow_requests.capacity,
+                    'captured_total': slow_requests.captured, 'requests': entries})
 
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({'status': 'healthy'})
+    return jsonify({
+        'status': 'healthy',
+        'models': {
+            'service_time': service_registry.version,
+            'staffing': staffing_registry.version,
+        },
+        'inference_engine': INFERENCE_ENGINE,
+        'micro_batch_window_ms': MICRO_BATCH_WINDOW_MS,
+        'service_time_grid': 'grid' in service_registry.current(),
+    })
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,240 @@
+import argparse
+import csv
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TASK1_FILE = os.path.join(BASE_DIR, 'datasets', 'task1_test_inputs.csv')
+TASK2_FILE = os.path.join(BASE_DIR, 'datasets', 'task2_test_inputs.csv')
+
+# endpoint name -> (path, input file, payload builder, batch endpoint?)
+ENDPOINTS = {
+    'service': ('/predict_service_time', TASK1_FILE, lambda r: {'date': r['date'], 'time': r['time'], 'task_id': r['task_id']}, False),
+    'predict': ('/predict', TASK1_FILE, lambda r: {'date': r['date'], 'time': r['time'], 'task_id': r['task_id']}, False),
+    'staffing': ('/predict_staffing', TASK2_FILE, lambda r: {'date': r['date'], 'section_id': r['section_id']}, False),
+    'service_batch': ('/predict_service_time/batch', TASK1_FILE, lambda r: {'date': r['date'], 'time': r['time'], 'task_id': r['task_id']}, True),
+    'staffing_batch': ('/predict_staffing/batch', TASK2_FILE, lambda r: {'date': r['date'], 'section_id': r['section_id']}, True),
+}
+
+
+def load_rows(path, limit):
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    return rows[:limit] if limit else rows
+
+
+def invalidate(payload, i):
+    """The i-th of several malformed variants of a payload: bad date, missing field, unknown id, bad time."""
+    variants = [dict(payload, date='2025-02-30'), {k: v for k, v in payload.items() if k != 'date'}]
+    if 'task_id' in payload:
+        variants += [dict(payload, task_id='TASK-999'), dict(payload, time='25:99')]
+    if 'section_id' in payload:
+        variants.append(dict(payload, section_id='SEC-999'))
+    return variants[i % len(variants)]
+
+
+def build_payloads(name, limit, batch_size, invalid_ratio=0.0, seed=0):
+    """Payloads for an endpoint; invalid_ratio of the rows (chosen with a fixed seed) are made invalid."""
+    path, input_file, builder, is_batch = ENDPOINTS[name]
+    items = [builder(row) for row in load_rows(input_file, limit)]
+    if invalid_ratio:
+        rng = random.Random(seed)
+        items = [invalidate(item, i) if rng.random() < invalid_ratio else item for i, item in enumerate(items)]
+    if is_batch:
+        return [items[i:i + batch_size] for i in range(0, len(items), batch_size)], len(items)
+    return items, len(items)
+
+
+class SessionPool:
+    """One keep-alive requests.Session per worker thread."""
+    def __init__(self, pool_size):
+        self.pool_size = pool_size
+        self._local = threading.local()
+
+    def get(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._local.session = session
+        return session
+
+
+def run_endpoint(base_url, name, payloads, concurrency, rate, timeout):
+    """
+    Replays payloads against one endpoint with `concurrency` worker threads. With rate > 0, request i
+    is released at start + i / rate (open-loop); otherwise workers send back to back.
+    Returns a list of (latency_seconds, status_or_error) per request and the wall time.
+    Open-loop latency runs from the scheduled release time, not the actual send, so time a request
+    spent waiting for a free worker counts (no coordinated omission when the sender falls behind).
+    """
+    url = base_url.rstrip('/') + ENDPOINTS[name][0]
+    sessions = SessionPool(concurrency)
+    results = [None] * len(payloads)
+    start = time.perf_counter()
+
+    def send(i):
+        if rate > 0:
+            sent = start + i / rate
+            delay = sent - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        else:
+            sent = time.perf_counter()
+        try:
+            resp = sessions.get().post(url, json=payloads[i], timeout=timeout)
+            resp.content
+            outcome = resp.status_code
+        except requests.RequestException as e:
+            outcome = type(e).__name__
+        results[i] = (time.perf_counter() - sent, outcome)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(send, range(len(payloads))))
+    return results, time.perf_counter() - start
+
+
+def summarize(results, wall_seconds, items):
+    latencies = np.array([r[0] for r in results]) * 1000
+    errors = {}
+    for _, outcome in results:
+        if outcome != 200:
+            errors[str(outcome)] = errors.get(str(outcome), 0) + 1
+    return {
+        'requests': len(results),
+        'items': items,
+        'errors': errors,
+        'wall_seconds': wall_seconds,
+        'requests_per_second': len(results) / wall_seconds if wall_seconds else 0.0,
+        'items_per_second': items / wall_seconds if wall_seconds else 0.0,
+        'latency_ms': {
+            'mean': float(latencies.mean()) if len(latencies) else 0.0,
+            'p50': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            'p95': float(np.percentile(latencies, 95)) if len(latencies) else 0.0,
+            'p99': float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+            'max': float(latencies.max()) if len(latencies) else 0.0,
+        },
+    }
+
+
+def print_summary(name, summary):
+    lat = summary['latency_ms']
+    errors = sum(summary['errors'].values())
+    print(f"{name:15s} {summary['requests']:7d} req  {summary['requests_per_second']:9.1f} req/s  "
+          f"{summary['items_per_second']:10.1f} items/s  p50 {lat['p50']:7.2f}ms  p95 {lat['p95']:7.2f}ms  "
+          f"p99 {lat['p99']:7.2f}ms  errors {errors}")
+
+
+def compare(current, baseline_path):
+    """Prints throughput and latency changes relative to a previous results file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} ({baseline.get('git_commit', '?')[:10]}):")
+    for name, summary in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for label, now, then in (
+            ('req/s', summary['requests_per_second'], before['requests_per_second']),
+            ('p50', summary['latency_ms']['p50'], before['latency_ms']['p50']),
+            ('p99', summary['latency_ms']['p99'], before['latency_ms']['p99']),
+        ):
+            pct = (now - then) / then * 100 if then else 0.0
+            changes.append(f"{label} {then:.2f} -> {now:.2f} ({pct:+.1f}%)")
+        print(f"  {name:15s} " + '  '.join(changes))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=BASE_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_server(port, command):
+    """Starts the API locally (Flask threaded server by default) and waits for /health."""
+    if command:
+        cmd = command.format(port=port).split()
+    else:
+        cmd = [sys.executable, '-c', f"import app; app.app.run(host='127.0.0.1', port={port}, threaded=True)"]
+    proc = subprocess.Popen(cmd, cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Server exited with code {proc.returncode}: {' '.join(cmd)}")
+        try:
+            if requests.get(url + '/health', timeout=1).status_code == 200:
+                return proc, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    proc.terminate()
+    raise RuntimeError('Server did not become healthy within 60s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent load test and latency benchmark for the prediction API.')
+    parser.add_argument('--url', default='http://localhost:5000', help='Base URL of a running server')
+    parser.add_argument('--start-server', action='store_true', help='Start app.py locally for the run')
+    parser.add_argument('--port', type=int, default=5055, help='Port for --start-server')
+    parser.add_argument('--server-cmd', help='Command for --start-server, e.g. "gunicorn -w 4 -b 127.0.0.1:{port} app:app"')
+    parser.add_argument('--endpoints', default='service,staffing', help=f"Comma separated: {', '.join(ENDPOINTS)}")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=0, help='Target requests/s per endpoint (0 = as fast as possible)')
+    parser.add_argument('--limit', type=int, default=2000, help='Input rows replayed per endpoint (0 = all)')
+    parser.add_argument('--batch-size', type=int, default=500, help='Items per request for batch endpoints')
+    parser.add_argument('--invalid-ratio', type=float, default=0.0,
+                        help='Share of rows sent malformed (unknown ids, bad dates/times, missing fields)')
+    parser.add_argument('--warmup', type=int, default=50, help='Unmeasured requests sent before each endpoint')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    parser.add_argument('--compare', help='Previous JSON results to compare against')
+    args = parser.parse_args()
+
+    proc = None
+    base_url = args.url
+    if args.start_server:
+        proc, base_url = start_server(args.port, args.server_cmd)
+    try:
+        report = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+            'endpoints': {},
+        }
+        for name in [n.strip() for n in args.endpoints.split(',') if n.strip()]:
+            payloads, items = build_payloads(name, args.limit, args.batch_size, args.invalid_ratio)
+            if args.warmup:
+                run_endpoint(base_url, name, payloads[:args.warmup], args.concurrency, 0, args.timeout)
+            results, wall = run_endpoint(base_url, name, payloads, args.concurrency, args.rate, args.timeout)
+            report['endpoints'][name] = summarize(results, wall, items)
+            print_summary(name, report['endpoints'][name])
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"Results written to {args.output}")
+        if args.compare:
+            compare(report, args.compare)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == '__main__':
+    main()
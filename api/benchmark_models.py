@@ -0,0 +1,287 @@
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+from datetime import datetime
+
+import numpy as np
+from sklearn.metrics import mean_absolute_error
+from sklearn.model_selection import train_test_split
+
+import generate_outputs as go
+from benchmark_api import ENDPOINTS, TASK1_FILE, TASK2_FILE, build_payloads, git_commit
+from compiled_model import CompiledEnsemble
+from model_registry import VERSIONS_DIR, resolve_model_dir
+from training_features import load_service_features, load_staffing_features
+
+# Per task: model folder, single-row endpoint (benchmark_api name), batch input file and scorer
+TASKS = {
+    'task1': (go.SERVICE_TASK_DIR, 'service', TASK1_FILE, go.score_service_chunk),
+    'task2': (go.STAFFING_TASK_DIR, 'staffing', TASK2_FILE, go.score_staffing_chunk),
+}
+
+# metric -> (path in a variant's report, True when higher is better); compared by --compare
+COMPARED_METRICS = {
+    'mae': (('accuracy', 'mae'), False),
+    'p50_ms': (('single_row', 'p50_ms'), False),
+    'p99_ms': (('single_row', 'p99_ms'), False),
+    'predict_p50_ms': (('predict', 'p50_ms'), False),
+    'predict_p99_ms': (('predict', 'p99_ms'), False),
+    'batch_rows_per_second': (('batch', 'rows_per_second'), True),
+    'load_seconds': (('artifacts', 'load_seconds'), False),
+    'size_bytes': (('artifacts', 'size_bytes'), False),
+    'n_trees': (('model', 'n_trees'), False),
+    'max_depth': (('model', 'max_depth'), False),
+}
+
+
+def discover_variants(task_dir, candidates=(), all_versions=False):
+    """{name: model_dir}: 'active' for the served version, plus candidates keyed by directory name."""
+    version, model_dir = resolve_model_dir(task_dir)
+    variants = {'active': model_dir}
+    dirs = list(candidates)
+    versions_root = os.path.join(task_dir, VERSIONS_DIR)
+    if all_versions and os.path.isdir(versions_root):
+        dirs += [os.path.join(versions_root, v) for v in sorted(os.listdir(versions_root))
+                 if not v.startswith('.') and os.path.isdir(os.path.join(versions_root, v))]
+    for path in dirs:
+        if os.path.abspath(path) != os.path.abspath(model_dir):
+            variants[os.path.basename(os.path.normpath(path))] = path
+    return version, variants
+
+
+def _holdout(df):
+    """Rows of the trainers' test split: train_test_split(test_size=0.2, random_state=42) on the same table."""
+    test_rows = train_test_split(np.arange(len(df)), test_size=0.2, random_state=42)[1]
+    return df.iloc[test_rows]
+
+
+def service_holdout():
+    df = load_service_features()
+    # Same staffing features as train_service_completion_model.py, including the NaN fills
+    ratio = df['total_task_time_minutes'] / df['employees_on_duty']
+    df = df.assign(staff_load_ratio=ratio.fillna(ratio.mean()),
+                   employees_on_duty=df['employees_on_duty'].fillna(df['employees_on_duty'].mean()))
+    return _holdout(df)
+
+
+def staffing_holdout():
+    return _holdout(load_staffing_features())
+
+
+def holdout_matrix(task, bundle, holdout):
+    """(unscaled feature matrix, target, known mask) for the held-out rows, encoded with this variant's encoders."""
+    section_codes = holdout['section_id'].astype(object).map(bundle['section_codes'])
+    if task == 'task1':
+        task_codes = holdout['task_id'].astype(object).map(bundle['task_codes'])
+        known = (task_codes.notna() & section_codes.notna()).to_numpy()
+        columns = [holdout['appointment_hour'], holdout['appointment_weekday'], holdout['month'],
+                   task_codes, section_codes, holdout['staff_load_ratio'], holdout['employees_on_duty']]
+        target = holdout['completion_time_minutes']
+    else:
+        known = section_codes.notna().to_numpy()
+        columns = [holdout['month'], holdout['weekday'], section_codes]
+        target = holdout['employees_on_duty']
+    X = np.column_stack([np.asarray(c, dtype=float)[known] for c in columns])
+    return X, target.to_numpy()[known], known
+
+
+def holdout_mae(task, bundle, holdout):
+    """Model MAE on the held-out rows, encoded with this variant's own encoders and scaler."""
+    X, target, known = holdout_matrix(task, bundle, holdout)
+    preds = bundle['model'].predict(bundle['scaler'].transform(X))
+    return {'mae': float(mean_absolute_error(target, preds)), 'rows': int(known.sum()),
+            'skipped_rows': int((~known).sum())}
+
+
+def _latency_summary(timings, **extra):
+    timings = np.array(timings)
+    return {'requests': len(timings), **extra, 'mean_ms': float(timings.mean()),
+            'p50_ms': float(np.percentile(timings, 50)), 'p99_ms': float(np.percentile(timings, 99))}
+
+
+def predict_latency(app_module, task, bundle, holdout, n, warmup=50):
+    """
+    Single-row latency of the model alone (app.predict_raw: the compiled engine or scaler + XGBoost,
+    as served) on held-out rows, in ms. Unlike the endpoint timings this always runs the trees, so it
+    moves with model depth and size even where the API answers from a precomputed table.
+    """
+    X = holdout_matrix(task, bundle, holdout)[0]
+    rows = [X[i % len(X)][None, :] for i in range(n)]
+    for row in rows[:warmup]:
+        app_module.predict_raw(bundle, row)
+    timings = []
+    for row in rows:
+        start = time.perf_counter()
+        app_module.predict_raw(bundle, row)
+        timings.append((time.perf_counter() - start) * 1000)
+    return _latency_summary(timings)
+
+
+def single_row_latency(client, path, payloads, warmup=50):
+    """
+    Per-request latency through the Flask app (routing, parsing, features, model, JSON) in ms.
+    Staffing requests are answered from the precomputed table, so for task2 this measures the
+    lookup path; predict_latency covers the model itself.
+    """
+    for payload in payloads[:warmup]:
+        client.post(path, json=payload)
+    timings, errors = [], 0
+    for payload in payloads:
+        start = time.perf_counter()
+        response = client.post(path, json=payload)
+        timings.append((time.perf_counter() - start) * 1000)
+        errors += response.status_code != 200
+    return _latency_summary(timings, errors=errors)
+
+
+def batch_throughput(task, model_dir, repeat):
+    """Best of repeat runs of the generate_outputs batch scorer over the task's test inputs."""
+    _, _, input_file, scorer = TASKS[task]
+    bundle = go.load_service_bundle(model_dir, use_grid=False) if task == 'task1' else go.load_staffing_bundle(model_dir)
+    runs = [go.score_file(input_file, os.devnull, scorer, bundle) for _ in range(repeat)]
+    best = max(runs, key=lambda s: s['rows_per_second'])
+    return {'input': os.path.basename(input_file), 'rows': best['rows'], 'errors': best['errors'],
+            'seconds': best['total_seconds'], 'rows_per_second': best['rows_per_second']}
+
+
+def artifact_sizes(model_dir):
+    """Bytes per artifact file (compiled_model/ counted as one entry) and their total."""
+    sizes = {}
+    for root, _, files in os.walk(model_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            key = os.path.relpath(path, model_dir).split(os.sep)[0]
+            # Only the variant's own files; a legacy task folder also holds versions/
+            if key != VERSIONS_DIR and not key.startswith('.'):
+                sizes[key] = sizes.get(key, 0) + os.path.getsize(path)
+    return sizes
+
+
+def benchmark_variant(app_module, client, task, name, model_dir, holdout, payloads, repeat):
+    """Loads one variant the way app.py does, pins it in the app's registry for the request timings, then restores the served bundle."""
+    registry = app_module.service_registry if task == 'task1' else app_module.staffing_registry
+    loader = app_module.load_service_bundle if task == 'task1' else app_module.load_staffing_bundle
+    load_times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        bundle = loader(name, model_dir)
+        load_times.append(time.perf_counter() - start)
+    compiled = CompiledEnsemble.from_xgb(bundle['model'])
+    sizes = artifact_sizes(model_dir)
+
+    previous = registry.current()
+    registry.replace(bundle)
+    try:
+        latency = single_row_latency(client, ENDPOINTS[TASKS[task][1]][0], payloads)
+    finally:
+        registry.replace(previous)
+    return {
+        'model_dir': os.path.relpath(model_dir, go.BASE_DIR),
+        'accuracy': holdout_mae(task, bundle, holdout),
+        'single_row': latency,
+        'predict': predict_latency(app_module, task, bundle, holdout, len(payloads)),
+        'batch': batch_throughput(task, model_dir, repeat),
+        'artifacts': {'size_bytes': sum(sizes.values()), 'files': sizes, 'load_seconds': min(load_times)},
+        'model': {'n_trees': len(compiled.roots), 'max_depth': int(compiled.max_depth)},
+    }
+
+
+def print_variant(task, name, report):
+    acc, lat, pred, batch, art, model = (report[k] for k in ('accuracy', 'single_row', 'predict', 'batch', 'artifacts', 'model'))
+    print(f"{task} {name:20s} MAE {acc['mae']:8.4f}  p50 {lat['p50_ms']:6.2f}ms  p99 {lat['p99_ms']:6.2f}ms  "
+          f"predict p50 {pred['p50_ms']:6.3f}ms  p99 {pred['p99_ms']:6.3f}ms  "
+          f"batch {batch['rows_per_second']:10,.0f} rows/s  {art['size_bytes'] / 1024:8.1f}KB  "
+          f"load {art['load_seconds'] * 1000:7.1f}ms  {model['n_trees']} trees, depth {model['max_depth']}")
+
+
+def _metric(report, path):
+    for key in path:
+        report = report[key]
+    return report
+
+
+def compare(current, baseline_path, tolerance):
+    """Prints metric changes per task and variant. Returns the changes worse than tolerance."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} ({(baseline.get('git_commit') or '?')[:10]}):")
+    regressions = []
+    for task, variants in current['tasks'].items():
+        for name, report in variants.items():
+            before = baseline.get('tasks', {}).get(task, {}).get(name)
+            if not before:
+                continue
+            changes = []
+            for metric, (path, higher_is_better) in COMPARED_METRICS.items():
+                try:
+                    now, then = _metric(report, path), _metric(before, path)
+                except KeyError:
+                    continue
+                change = (now - then) / then if then else 0.0
+                worse = -change if higher_is_better else change
+                flag = ''
+                if worse > tolerance:
+                    flag = ' !'
+                    regressions.append(f"{task}/{name} {metric} {then:g} -> {now:g}")
+                changes.append(f"{metric} {then:.4g} -> {now:.4g} ({change * 100:+.1f}%){flag}")
+            print(f"  {task} {name}:\n    " + '\n    '.join(changes))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Accuracy, latency, throughput and artifact cost of the served models and candidates.')
+    parser.add_argument('--tasks', default='task1,task2', help='Comma separated: task1, task2')
+    parser.add_argument('--task1-candidate', action='append', default=[], help='Task 1 model directory to compare (repeatable)')
+    parser.add_argument('--task2-candidate', action='append', default=[], help='Task 2 model directory to compare (repeatable)')
+    parser.add_argument('--all-versions', action='store_true', help='Include every directory under versions/')
+    parser.add_argument('--engine', default=os.environ.get('INFERENCE_ENGINE', 'xgboost'), choices=['xgboost', 'compiled'])
+    parser.add_argument('--requests', type=int, default=1000, help='Single-row requests per variant')
+    parser.add_argument('--repeat', type=int, default=3, help='Loads and batch runs per variant; the best is reported')
+    parser.add_argument('--output', default='model_benchmark.json')
+    parser.add_argument('--compare', help='Previous report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Relative change that counts as a regression with --compare (exit code 1)')
+    args = parser.parse_args()
+
+    # Set before app is imported: measure every request against the model (no prediction cache or
+    # precomputed service grid), without background pollers swapping the bundle mid-run
+    os.environ['INFERENCE_ENGINE'] = args.engine
+    os.environ['PREDICTION_CACHE_SIZE'] = '0'
+    os.environ['SERVICE_TIME_GRID'] = '0'
+    os.environ['START_BACKGROUND_THREADS'] = '0'
+    # The app passes plain arrays to scalers fitted on DataFrames; sklearn warns on every request
+    warnings.filterwarnings('ignore', message='X does not have valid feature names')
+    import app as app_module
+    client = app_module.app.test_client()
+
+    report = {'timestamp': datetime.now().isoformat(timespec='seconds'), 'git_commit': git_commit(),
+              'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare', 'tolerance')},
+              'tasks': {}}
+    for task in [t.strip() for t in args.tasks.split(',') if t.strip()]:
+        task_dir, endpoint = TASKS[task][:2]
+        version, variants = discover_variants(task_dir, getattr(args, f"{task}_candidate"), args.all_versions)
+        holdout = service_holdout() if task == 'task1' else staffing_holdout()
+        payloads = build_payloads(endpoint, args.requests, 1)[0]
+        report['tasks'][task] = {}
+        for name, model_dir in variants.items():
+            result = benchmark_variant(app_module, client, task, name, model_dir, holdout, payloads, args.repeat)
+            if name == 'active':
+                result['version'] = version
+            report['tasks'][task][name] = result
+            print_variant(task, name, result)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Report written to {args.output}")
+    if args.compare:
+        regressions = compare(report, args.compare, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} change(s) worse than {args.tolerance:.0%}:\n  " + '\n  '.join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
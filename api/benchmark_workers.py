@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import requests
+
+from benchmark_api import BASE_DIR, build_payloads, git_commit, run_endpoint, summarize
+
+# Linux only: memory is read from /proc/<pid>/smaps_rollup
+PAGE_FIELDS = {'Rss': 'rss', 'Pss': 'pss', 'Private_Clean': 'private', 'Private_Dirty': 'private'}
+CLOCK_TICKS = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+
+def memory_mb(pid):
+    """RSS, PSS (shared pages split between their users) and USS (private pages) of a process in MB."""
+    totals = {'rss': 0, 'pss': 0, 'private': 0}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in PAGE_FIELDS:
+                totals[PAGE_FIELDS[key]] += int(rest.split()[0])
+    return {'rss_mb': totals['rss'] / 1024, 'pss_mb': totals['pss'] / 1024, 'uss_mb': totals['private'] / 1024}
+
+
+def cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+
+
+def children(pid):
+    found = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    if int(f.read().rsplit(')', 1)[1].split()[1]) == pid:
+                        found.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    return sorted(found)
+
+
+def wait_for_workers(proc, url, workers, timeout=120):
+    """Waits until all workers are forked and the server answers /health. Returns seconds taken."""
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {proc.returncode}")
+        if len(children(proc.pid)) >= workers:
+            try:
+                if requests.get(url + '/health', timeout=1).status_code == 200:
+                    return time.perf_counter() - start
+            except requests.RequestException:
+                pass
+        time.sleep(0.05)
+    raise RuntimeError(f"Workers not ready within {timeout}s")
+
+
+def run_mode(preload, args):
+    env = dict(os.environ, GUNICORN_PRELOAD='1' if preload else '0', WEB_CONCURRENCY=str(args.workers),
+               GUNICORN_BIND=f"127.0.0.1:{args.port}", INFERENCE_ENGINE=args.engine, MODEL_POLL_INTERVAL='0')
+    cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app']
+    proc = subprocess.Popen(cmd, cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{args.port}"
+    try:
+        startup = wait_for_workers(proc, url, args.workers)
+        # Let every worker see traffic so lazily touched pages are counted too
+        payloads, items = build_payloads('service', args.requests, 1)
+        results, wall = run_endpoint(url, 'service', payloads, args.workers * 2, 0, 30)
+        pids = children(proc.pid)
+        workers = [dict(memory_mb(pid), pid=pid, cpu_seconds=cpu_seconds(pid)) for pid in pids]
+        report = {
+            'preload': preload,
+            'startup_seconds': startup,
+            'master': dict(memory_mb(proc.pid), cpu_seconds=cpu_seconds(proc.pid)),
+            'workers': workers,
+            'total_pss_mb': memory_mb(proc.pid)['pss_mb'] + sum(w['pss_mb'] for w in workers),
+            'service': summarize(results, wall, items),
+        }
+        return report
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def print_report(report):
+    mode = 'preload' if report['preload'] else 'no preload'
+    workers = report['workers']
+    # Worker CPU seconds include the app load a non-preloaded worker pays on every (re)start
+    print(f"\n{mode}: {len(workers)} workers ready in {report['startup_seconds']:.2f}s, "
+          f"total PSS {report['total_pss_mb']:.1f}MB")
+    print(f"  {'process':>10s} {'RSS MB':>8s} {'PSS MB':>8s} {'USS MB':>8s} {'CPU s':>7s}")
+    master = report['master']
+    print(f"  {'master':>10s} {master['rss_mb']:8.1f} {master['pss_mb']:8.1f} {master['uss_mb']:8.1f} {master['cpu_seconds']:7.2f}")
+    for worker in workers:
+        print(f"  {worker['pid']:>10d} {worker['rss_mb']:8.1f} {worker['pss_mb']:8.1f} {worker['uss_mb']:8.1f} {worker['cpu_seconds']:7.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-worker memory and startup time of gunicorn with and without preloading.')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5056)
+    parser.add_argument('--modes', default='preload,no-preload', help='Comma separated: preload, no-preload')
+    parser.add_argument('--engine', default=os.environ.get('INFERENCE_ENGINE', 'xgboost'), choices=['xgboost', 'compiled'])
+    parser.add_argument('--requests', type=int, default=2000, help='Service requests sent before measuring')
+    parser.add_argument('--output', help='Write results as JSON to this path')
+    args = parser.parse_args()
+
+    results = {'timestamp': datetime.now().isoformat(timespec='seconds'), 'git_commit': git_commit(),
+               'config': {k: v for k, v in vars(args).items() if k != 'output'}, 'modes': {}}
+    for mode in [m.strip() for m in args.modes.split(',') if m.strip()]:
+        report = run_mode(mode == 'preload', args)
+        results['modes'][mode] = report
+        print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+import argparse
+import json
+import os
+import shutil
+import time
+import numpy as np
+
+# Flat NumPy export of a trained XGBRegressor, saved next to the model pickle as a directory of
+# .npy files so every gunicorn worker can memory-map the same read-only pages.
+# COMPILED_MODEL_FILE is the older single-file export, still loaded when no directory exists.
+COMPILED_MODEL_DIR = 'compiled_model'
+COMPILED_MODEL_FILE = 'compiled_model.npz'
+_ARRAYS = ('feature', 'threshold', 'yes', 'no', 'missing', 'value', 'roots', 'feature_index')
+
+
+def _raw_cut_points(threshold, mean, scale):
+    """
+    For each split returns the smallest raw value c with float32((c - mean) / scale) >= threshold.
+
+    XGBoost compares float32 inputs with float32 thresholds, and hist split points sit exactly on
+    training values, so t * scale + mean can land on the wrong side of a data value after rounding.
+    The comparison is monotonic in the raw value, so a bisection around that estimate recovers a
+    cut point where `x < c` agrees exactly with `float32(scaled x) < threshold`.
+    """
+    threshold = threshold.astype(np.float32)
+
+    def at_or_above(x):
+        return ((x - mean) / scale).astype(np.float32) >= threshold
+
+    guess = threshold.astype(np.float64) * scale + mean
+    delta = np.abs(guess) * 1e-5 + np.abs(scale) * 1e-5 + 1e-12
+    lo, hi = guess - delta, guess + delta
+    # Widen until lo is strictly below and hi is at or above the cut
+    for _ in range(64):
+        bad = at_or_above(lo) | ~at_or_above(hi)
+        if not bad.any():
+            break
+        delta = np.where(bad, delta * 2, delta)
+        lo, hi = guess - delta, guess + delta
+    for _ in range(80):
+        mid = lo + (hi - lo) / 2
+        above = at_or_above(mid)
+        hi = np.where(above, mid, hi)
+        lo = np.where(above, lo, mid)
+    return hi
+
+
+class CompiledEnsemble:
+    """
+    Tree ensemble flattened into NumPy node arrays and evaluated for all rows and all trees at once.
+
+    Every node has a feature, threshold, yes/no/missing child and leaf value; leaves point to
+    themselves, so walking max_depth steps from the roots lands every (row, tree) pair on a leaf.
+    When a StandardScaler is folded in, thresholds are mapped back to raw feature units, so inputs
+    are passed unscaled (see _raw_cut_points).
+    """
+    def __init__(self, feature, threshold, yes, no, missing, value, roots, base_score, max_depth, feature_index=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.yes = yes
+        self.no = no
+        self.missing = missing
+        self.value = value
+        self.roots = roots
+        self.base_score = base_score
+        self.max_depth = max_depth
+        # Leaves read feature 0; the comparison result is ignored because the child is the leaf itself
+        self.feature_index = np.where(feature < 0, 0, feature) if feature_index is None else feature_index
+
+    @classmethod
+    def from_xgb(cls, model, scaler=None):
+        """Exports the trees of an XGBRegressor (optionally folding a fitted StandardScaler)."""
+        booster = model.get_booster()
+        dumps = booster.get_dump(dump_format='json')
+        try:
+            # With early stopping, predict() only uses trees up to best_iteration
+            dumps = dumps[:model.best_iteration + 1]
+        except AttributeError:
+            pass
+        names = booster.feature_names
+        feature_ids = {name: i for i, name in enumerate(names)} if names else {}
+        nodes = {'feature': [], 'threshold': [], 'yes': [], 'no': [], 'missing': [], 'value': []}
+        roots = []
+        max_depth = 0
+        for dump in dumps:
+            offset = len(nodes['feature'])
+            tree = {}
+            stack = [json.loads(dump)]
+            while stack:
+                node = stack.pop()
+                tree[node['nodeid']] = node
+                stack.extend(node.get('children', []))
+            for node_id in range(len(tree)):
+                node = tree[node_id]
+                index = offset + node_id
+                if 'leaf' in node:
+                    nodes['feature'].append(-1)
+                    nodes['threshold'].append(0.0)
+                    nodes['yes'].append(index)
+                    nodes['no'].append(index)
+                    nodes['missing'].append(index)
+                    nodes['value'].append(node['leaf'])
+                else:
+                    split = node['split']
+                    nodes['feature'].append(feature_ids[split] if split in feature_ids else int(split.lstrip('f')))
+                    nodes['threshold'].append(np.float32(node['split_condition']))
+                    nodes['yes'].append(offset + node['yes'])
+                    nodes['no'].append(offset + node['no'])
+                    nodes['missing'].append(offset + node['missing'])
+                    nodes['value'].append(0.0)
+                    max_depth = max(max_depth, node['depth'] + 1)
+            roots.append(offset)
+        feature = np.array(nodes['feature'], dtype=np.int32)
+        threshold = np.array(nodes['threshold'], dtype=np.float64)
+        split = feature >= 0
+        if scaler is not None:
+            mean, scale = scaler.mean_[feature[split]], scaler.scale_[feature[split]]
+        else:
+            mean, scale = np.zeros(split.sum()), np.ones(split.sum())
+        threshold[split] = _raw_cut_points(threshold[split], mean, scale)
+        base_score = float(json.loads(booster.save_config())['learner']['learner_model_param']['base_score'].strip('[]'))
+        return cls(feature, threshold,
+                   np.array(nodes['yes'], dtype=np.int32), np.array(nodes['no'], dtype=np.int32),
+                   np.array(nodes['missing'], dtype=np.int32), np.array(nodes['value'], dtype=np.float32),
+                   np.array(roots, dtype=np.int32), base_score, max_depth)
+
+    def predict(self, X):
+        """Predicts for a 2D array of raw features (or a single 1D row)."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        rows = np.arange(len(X))[:, None]
+        node = np.broadcast_to(self.roots, (len(X), len(self.roots)))
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature_index[node]]
+            child = np.where(x < self.threshold[node], self.yes[node], self.no[node])
+            node = np.where(np.isnan(x), self.missing[node], child)
+        return self.value[node].sum(axis=1, dtype=np.float32) + np.float32(self.base_score)
+
+    def save(self, path):
+        """Writes one .npy per array plus meta.json into directory path (replaced atomically)."""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(tmp_path)
+        for name in _ARRAYS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(getattr(self, name)))
+        with open(os.path.join(tmp_path, 'meta.json'), 'w') as f:
+            json.dump({'base_score': self.base_score, 'max_depth': self.max_depth}, f)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        """
+        Loads a saved export. A directory is memory-mapped read-only (unless mmap=False), so
+        processes loading the same files share its pages; a legacy .npz file is read into memory.
+        """
+        if os.path.isdir(path):
+            with open(os.path.join(path, 'meta.json')) as f:
+                meta = json.load(f)
+            arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r' if mmap else None)
+                      for name in _ARRAYS}
+            return cls(arrays['feature'], arrays['threshold'], arrays['yes'], arrays['no'], arrays['missing'],
+                       arrays['value'], arrays['roots'], meta['base_score'], meta['max_depth'],
+                       arrays['feature_index'])
+        with np.load(path) as data:
+            return cls(data['feature'], data['threshold'], data['yes'], data['no'], data['missing'],
+                       data['value'], data['roots'], float(data['base_score']), int(data['max_depth']))
+
+
+def check_parity(compiled, model, scaler, X_raw, atol=1e-3):
+    """
+    Compares compiled predictions on raw features with model.predict on scaled features.
+    Returns (max_abs_diff, rounded_mismatches).
+    """
+    expected = model.predict(scaler.transform(X_raw))
+    actual = compiled.predict(X_raw)
+    diff = np.abs(expected.astype(np.float64) - actual.astype(np.float64))
+    rounded = int((np.maximum(1, np.round(expected)) != np.maximum(1, np.round(actual))).sum())
+    if diff.size and diff.max() > atol:
+        raise AssertionError(f"Compiled model differs from model.predict by up to {diff.max():.6f}")
+    return float(diff.max()) if diff.size else 0.0, rounded
+
+
+def compile_and_save(model, scaler, model_dir, X_check=None):
+    """Exports model (with scaler folded in) to model_dir, verifying parity on X_check if given."""
+    compiled = CompiledEnsemble.from_xgb(model, scaler)
+    if X_check is not None:
+        check_parity(compiled, model, scaler, X_check)
+    compiled.save(os.path.join(model_dir, COMPILED_MODEL_DIR))
+    return compiled
+
+
+def load_compiled(model_dir, model, scaler):
+    """
+    Loads (memory-maps) the compiled export saved next to the model, falling back to the legacy
+    .npz file, and compiles on the fly if neither exists or both are older than the model pickle.
+    """
+    pickles = [os.path.join(model_dir, f) for f in os.listdir(model_dir) if f.startswith('xgb_') and f.endswith('.pkl')]
+    for name in (COMPILED_MODEL_DIR, COMPILED_MODEL_FILE):
+        path = os.path.join(model_dir, name)
+        if os.path.exists(path) and all(os.path.getmtime(path) >= os.path.getmtime(p) for p in pickles):
+            return CompiledEnsemble.load(path)
+    return CompiledEnsemble.from_xgb(model, scaler)
+
+
+def _latency(fn, rows, repeat):
+    """Per-call latency in microseconds for fn over single rows: (mean, p50, p99)."""
+    timings = []
+    for i in range(repeat):
+        row = rows[i % len(rows)][None, :]
+        start = time.perf_counter()
+        fn(row)
+        timings.append((time.perf_counter() - start) * 1e6)
+    timings = np.array(timings)
+    return timings.mean(), np.percentile(timings, 50), np.percentile(timings, 99)
+
+
+def main():
+    import joblib
+    import pandas as pd
+    import generate_outputs as go
+    from model_registry import resolve_model_dir
+
+    parser = argparse.ArgumentParser(description='Parity check and microbenchmark for the compiled tree ensembles.')
+    parser.add_argument('--task', choices=['service', 'staffing'], default='service')
+    parser.add_argument('--repeat', type=int, default=2000, help='Single-row calls per engine')
+    parser.add_argument('--save', action='store_true', help='Write the compiled_model/ directory (memory-mappable .npy arrays) next to the active model')
+    args = parser.parse_args()
+
+    if args.task == 'service':
+        model_dir = resolve_model_dir(go.SERVICE_TASK_DIR)[1]
+        model = joblib.load(os.path.join(model_dir, 'xgb_service_completion_model.pkl'))
+        X, _ = go.service_feature_matrix(pd.read_csv(os.path.join(go.DATA_DIR, 'task1_test_inputs.csv'), dtype=str),
+                                         go.load_service_bundle(model_dir))
+    else:
+        model_dir = resolve_model_dir(go.STAFFING_TASK_DIR)[1]
+        model = joblib.load(os.path.join(model_dir, 'xgb_staffing_model.pkl'))
+        X, _ = go.staffing_feature_matrix(pd.read_csv(os.path.join(go.DATA_DIR, 'task2_test_inputs.csv'), dtype=str),
+                                          go.load_staffing_bundle(model_dir))
+    X = X.astype(float)
+    scaler = joblib.load(os.path.join(model_dir, 'scaler.pkl'))
+    compiled = CompiledEnsemble.from_xgb(model, scaler)
+
+    max_diff, rounded = check_parity(compiled, model, scaler, X)
+    print(f"Parity on {len(X)} rows: max |diff| {max_diff:.2e}, rounded prediction mismatches {rounded}")
+
+    # Suppress sklearn's feature-name warning so it does not dominate the timings
+    import warnings
+    warnings.filterwarnings('ignore')
+    mean, p50, p99 = _latency(lambda row: model.predict(scaler.transform(row)), X, args.repeat)
+    print(f"xgboost  single row: mean {mean:8.1f}us  p50 {p50:8.1f}us  p99 {p99:8.1f}us")
+    c_mean, c_p50, c_p99 = _latency(compiled.predict, X, args.repeat)
+    print(f"compiled single row: mean {c_mean:8.1f}us  p50 {c_p50:8.1f}us  p99 {c_p99:8.1f}us  ({mean / c_mean:.1f}x)")
+    for name, fn in (('xgboost ', lambda: model.predict(scaler.transform(X))), ('compiled', lambda: compiled.predict(X))):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        print(f"{name} batch of {len(X)}: {elapsed * 1e3:8.1f}ms  ({len(X) / elapsed:,.0f} rows/s)")
+
+    if args.save:
+        compiled.save(os.path.join(model_dir, COMPILED_MODEL_DIR))
+        print(f"Saved {COMPILED_MODEL_DIR}/ to {model_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,12 @@
+import os
+
+# test_service_time_api.py and test_staffing_api.py are scripts for a running server, not tests
+collect_ignore = ['test_service_time_api.py', 'test_staffing_api.py']
+
+# Set before app is imported: no pollers or micro-batcher threads during tests
+os.environ.setdefault('START_BACKGROUND_THREADS', '0')
+
+
+def pytest_configure(config):
+    # The app passes plain arrays to scalers fitted on DataFrames; sklearn warns on every request
+    config.addinivalue_line('filterwarnings', 'ignore:X does not have valid feature names')
@@ -0,0 +1,257 @@
+import argparse
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from metrics import NULL_TIMER
+
+# Row status codes returned by the vectorized entry points, in the order they are checked
+OK = 0
+UNKNOWN_TASK = 1        # task_id not in tasks.csv
+INVALID_DATE = 2
+INVALID_TIME = 3
+UNKNOWN_TO_MODEL = 4    # task or section missing from the model's label encoders
+
+class FeatureError(ValueError):
+    """A row that cannot be encoded; status is one of the row status codes above."""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# Placeholders for the staffing features when real staffing numbers are not supplied
+DEFAULT_STAFF_LOAD_RATIO = 1.0
+DEFAULT_EMPLOYEES_ON_DUTY = 1.0
+
+
+class CalendarCache:
+    """
+    Memoized date string -> (month, weekday, date). ISO dates are parsed with datetime.fromisoformat;
+    anything else falls back to pd.to_datetime. Unparseable strings are cached as None.
+    Requests and input files reuse a small set of dates, so nearly every lookup is a dict hit.
+    """
+    def __init__(self, maxsize=65536):
+        self.maxsize = maxsize
+        self._data = {}
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, date):
+        try:
+            return self._data[date]
+        except KeyError:
+            pass
+        except TypeError:
+            # Unhashable input; not cacheable
+            return self._parse(date)
+        value = self._parse(date)
+        if len(self._data) >= self.maxsize:
+            self._data.clear()
+        self._data[date] = value
+        return value
+
+    @staticmethod
+    def _parse(date):
+        try:
+            date_dt = datetime.fromisoformat(date)
+        except (TypeError, ValueError):
+            try:
+                date_dt = pd.to_datetime(date)
+            except (TypeError, ValueError, OverflowError):
+                return None
+            if pd.isna(date_dt):
+                return None
+        return date_dt.month, date_dt.weekday(), date_dt.date()
+
+    def lookup(self, values):
+        """Vectorized get: (months, weekdays, valid) arrays, parsing each distinct value once."""
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+        parsed = [self.get(value) for value in uniques] + [None]
+        months = np.array([p[0] if p else 0 for p in parsed], dtype=int)
+        weekdays = np.array([p[1] if p else 0 for p in parsed], dtype=int)
+        known = np.array([p is not None for p in parsed])
+        # factorize marks missing values with -1, which picks the trailing None slot
+        return months[codes], weekdays[codes], known[codes]
+
+    def dates(self, values):
+        """Vectorized get of the calendar day: a DatetimeIndex with NaT for unparseable values."""
+        codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+        parsed = [self.get(value) for value in uniques] + [None]
+        return pd.DatetimeIndex([p[2] if p else pd.NaT for p in parsed])[codes]
+
+
+# Shared by every pipeline in the process, so a model reload keeps the warm cache
+calendar_cache = CalendarCache()
+
+
+def parse_hour(value):
+    """Hour from an 'HH:MM' (or 'H', 'HH:MM:SS') string, or None if it is not a valid hour."""
+    text = str(value)
+    colon = text.find(':')
+    try:
+        hour = int(text[:colon] if colon >= 0 else text)
+    except ValueError:
+        return None
+    return hour if 0 <= hour <= 23 else None
+
+
+def parse_hours(values):
+    """Vectorized parse_hour: (hours, valid) arrays, parsing each distinct value once."""
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object))
+    parsed = [parse_hour(value) for value in uniques] + [None]
+    hours = np.array([h if h is not None else 0 for h in parsed], dtype=int)
+    known = np.array([h is not None for h in parsed])
+    return hours[codes], known[codes]
+
+
+class FeaturePipeline:
+    """
+    Feature engineering for both models, built once per model version from the tasks table and
+    the label encoders' classes. Encoding is a dict lookup instead of LabelEncoder.transform.
+
+    Service rows are (hour, weekday, month, task_code, section_code, staff_load_ratio,
+    employees_on_duty), the training column order; staffing rows are (month, weekday, section_code).
+    """
+    def __init__(self, task_sections, task_codes, section_codes, calendar=None):
+        self.task_sections = task_sections
+        self.task_codes = task_codes
+        self.section_codes = section_codes
+        self.calendar = calendar or calendar_cache
+
+    @classmethod
+    def from_encoders(cls, tasks_df=None, le_task=None, le_section=None, calendar=None):
+        task_sections = {}
+        if tasks_df is not None:
+            # First row wins when a task_id is listed twice
+            for task_id, section_id in zip(tasks_df['task_id'], tasks_df['section_id']):
+                task_sections.setdefault(task_id, section_id)
+        task_codes = {label: code for code, label in enumerate(le_task.classes_)} if le_task is not None else {}
+        section_codes = {label: code for code, label in enumerate(le_section.classes_)} if le_section is not None else {}
+        return cls(task_sections, task_codes, section_codes, calendar)
+
+    # --- scalar entry points (single API requests) ---
+
+    def service_row(self, date, time_str, task_id, staff_load_ratio=DEFAULT_STAFF_LOAD_RATIO,
+                    employees_on_duty=DEFAULT_EMPLOYEES_ON_DUTY, timer=NULL_TIMER):
+        """
+        Service feature tuple, or None when task_id is not in tasks.csv. Raises FeatureError for an
+        invalid date or time, or a task/section the model was not trained on. Marks the 'lookup'
+        (tasks.csv) and 'date_parse' stages on timer; the caller marks 'encode' after it returns.
+        """
+        section_id = self.task_sections.get(task_id)
+        timer.mark('lookup')
+        if section_id is None:
+            return None
+        calendar = self.calendar.get(date)
+        if calendar is None:
+            raise FeatureError(INVALID_DATE, f"Invalid date {date!r}")
+        hour = parse_hour(time_str)
+        if hour is None:
+            raise FeatureError(INVALID_TIME, f"Invalid time {time_str!r}")
+        timer.mark('date_parse')
+        task_code = self.task_codes.get(task_id)
+        if task_code is None:
+            raise FeatureError(UNKNOWN_TO_MODEL, f"task_id {task_id!r} is unknown to the loaded model")
+        section_code = self.section_codes.get(section_id)
+        if section_code is None:
+            raise FeatureError(UNKNOWN_TO_MODEL, f"section_id {section_id!r} is unknown to the loaded model")
+        month, weekday = calendar[0], calendar[1]
+        return (hour, weekday, month, task_code, section_code, staff_load_ratio, employees_on_duty)
+
+    def staffing_row(self, date, section_id):
+        """(month, weekday, section_code), or None for an unknown section. Raises FeatureError for an invalid date."""
+        section_code = self.section_codes.get(str(section_id).upper())
+        if section_code is None:
+            return None
+        calendar = self.calendar.get(date)
+        if calendar is None:
+            raise FeatureError(INVALID_DATE, f"Invalid date {date!r}")
+        return calendar[0], calendar[1], section_code
+
+    # --- vectorized entry points (batches and files) ---
+
+    def service_matrix(self, dates, times, task_ids):
+        """
+        Service features for many rows. Returns (X, status): X is a float matrix holding only the
+        rows whose status is OK, with placeholder staffing features; status has one code per row.
+        """
+        task_ids = pd.Series(task_ids, dtype=object)
+        section_ids = task_ids.map(self.task_sections)
+        months, weekdays, date_ok = self.calendar.lookup(dates)
+        hours, hour_ok = parse_hours(times)
+        task_codes = task_ids.map(self.task_codes)
+        section_codes = section_ids.map(self.section_codes)
+        model_ok = task_codes.notna().to_numpy() & section_codes.notna().to_numpy()
+        status = np.select([section_ids.isna().to_numpy(), ~date_ok, ~hour_ok, ~model_ok],
+                           [UNKNOWN_TASK, INVALID_DATE, INVALID_TIME, UNKNOWN_TO_MODEL], OK)
+        ok = status == OK
+        n = int(ok.sum())
+        X = np.column_stack([
+            hours[ok], weekdays[ok], months[ok],
+            task_codes[ok].to_numpy(dtype=float), section_codes[ok].to_numpy(dtype=float),
+            np.full(n, DEFAULT_STAFF_LOAD_RATIO), np.full(n, DEFAULT_EMPLOYEES_ON_DUTY),
+        ]).astype(float)
+        return X, status
+
+    def staffing_matrix(self, dates, section_ids):
+        """(month, weekday, section_code) int matrix for the valid rows, and the validity mask."""
+        section_codes = pd.Series(section_ids, dtype=object).astype(str).str.upper().map(self.section_codes)
+        months, weekdays, date_ok = self.calendar.lookup(dates)
+        valid = section_codes.notna().to_numpy() & date_ok
+        X = np.column_stack([months[valid], weekdays[valid], section_codes[valid].to_numpy(dtype=int)]).astype(int)
+        return X, valid
+
+
+def _legacy_service_row(date, time_str, task_id, le_task, le_section, tasks_df):
+    """The per-row feature code this module replaced: pd.to_datetime, a DataFrame scan and LabelEncoder.transform."""
+    date_dt = pd.to_datetime(date)
+    hour = int(time_str.split(':')[0])
+    section_id = tasks_df.loc[tasks_df['task_id'] == task_id, 'section_id'].values[0]
+    return (hour, date_dt.weekday(), date_dt.month, le_task.transform([task_id])[0],
+            le_section.transform([section_id])[0], 1.0, 1.0)
+
+
+def main():
+    import os
+    import generate_outputs as go
+    import joblib
+    from model_registry import resolve_model_dir
+
+    parser = argparse.ArgumentParser(description='Per-row feature engineering cost, before and after the shared pipeline.')
+    parser.add_argument('--rows', type=int, default=5000, help='Rows from task1_test_inputs.csv')
+    args = parser.parse_args()
+
+    model_dir = resolve_model_dir(go.SERVICE_TASK_DIR)[1]
+    le_task = joblib.load(os.path.join(model_dir, 'task_label_encoder.pkl'))
+    le_section = joblib.load(os.path.join(model_dir, 'section_label_encoder.pkl'))
+    tasks_df = pd.read_csv(os.path.join(go.DATA_DIR, 'tasks.csv'))
+    rows = pd.read_csv(os.path.join(go.DATA_DIR, 'task1_test_inputs.csv'), dtype=str, nrows=args.rows)
+    rows = rows[rows['task_id'].isin(le_task.classes_)]
+    records = list(zip(rows['date'], rows['time'], rows['task_id']))
+
+    def per_row_us(fn):
+        start = time.perf_counter()
+        fn()
+        return (time.perf_counter() - start) / len(records) * 1e6
+
+    legacy = per_row_us(lambda: [_legacy_service_row(d, t, task, le_task, le_section, tasks_df) for d, t, task in records])
+    cold = FeaturePipeline.from_encoders(tasks_df, le_task, le_section, CalendarCache())
+    cold_us = per_row_us(lambda: [cold.service_row(d, t, task) for d, t, task in records])
+    warm_us = per_row_us(lambda: [cold.service_row(d, t, task) for d, t, task in records])
+    vector = FeaturePipeline.from_encoders(tasks_df, le_task, le_section, CalendarCache())
+    vector_us = per_row_us(lambda: vector.service_matrix(rows['date'], rows['time'], rows['task_id']))
+
+    X, status = vector.service_matrix(rows['date'], rows['time'], rows['task_id'])
+    expected = np.array([_legacy_service_row(d, t, task, le_task, le_section, tasks_df) for d, t, task in records[:500]], dtype=float)
+    assert (status == OK).all() and np.array_equal(X[:500], expected), 'pipeline features differ from the legacy code'
+
+    print(f"{len(records)} rows, identical features")
+    print(f"legacy per-row (pd.to_datetime + LabelEncoder): {legacy:9.2f}us/row")
+    print(f"pipeline scalar, cold calendar cache:          {cold_us:9.2f}us/row  ({legacy / cold_us:.0f}x)")
+    print(f"pipeline scalar, warm calendar cache:          {warm_us:9.2f}us/row  ({legacy / warm_us:.0f}x)")
+    print(f"pipeline vectorized:                           {vector_us:9.2f}us/row  ({legacy / vector_us:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
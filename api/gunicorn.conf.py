@@ -0,0 +1,34 @@
+import gc
+import multiprocessing
+import os
+
+# gunicorn -c gunicorn.conf.py app:app
+#
+# The app (both models, encoders, lookup tables and every imported library) is loaded once in
+# the master and workers are forked from it, so they share those pages copy-on-write instead of
+# each loading a private copy. Workers start in milliseconds because there is nothing left to load.
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+
+# Threads (model pollers, micro-batcher) would die in the fork; app.py leaves them to post_worker_init
+os.environ['START_BACKGROUND_THREADS'] = '0'
+
+
+def when_ready(server):
+    # Move everything loaded so far out of the collector's reach: a GC pass writes to every tracked
+    # object's header, which would copy the shared pages into each worker.
+    gc.collect()
+    gc.freeze()
+
+
+def pre_fork(server, worker):
+    # Also freeze objects the master created since (e.g. before respawning a worker)
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    import app
+    app.start_background_threads()
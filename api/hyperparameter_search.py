@@ -0,0 +1,204 @@
+import csv
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+import numpy as np
+from sklearn.metrics import mean_absolute_error
+from xgboost import XGBRegressor
+
+# Leaderboard written next to model_metrics.txt by the training scripts in --tune mode
+LEADERBOARD_FILE = 'model_leaderboard.csv'
+
+# Sampled per candidate; n_estimators is the successive-halving resource and is set per rung
+SEARCH_SPACE = {
+    'max_depth': [3, 4, 5, 6, 8],
+    'learning_rate': [0.03, 0.05, 0.1, 0.2, 0.3],
+    'subsample': [0.7, 0.85, 1.0],
+    'colsample_bytree': [0.7, 0.85, 1.0],
+    'min_child_weight': [1, 3, 5, 10],
+}
+
+LEADERBOARD_COLUMNS = ['rank', 'candidate', 'rung', 'n_estimators', 'best_iteration', 'val_mae', 'fit_seconds',
+                       'single_row_p50_ms', 'single_row_p99_ms', 'batch_ms_per_1k', 'meets_slo',
+                       'max_depth', 'learning_rate', 'subsample', 'colsample_bytree', 'min_child_weight']
+
+# Training data for pool workers, set once per process by _init_worker
+_DATA = None
+
+
+def _init_worker(X_train, y_train, X_val, y_val):
+    global _DATA
+    _DATA = (X_train, y_train, X_val, y_val)
+
+
+def sample_candidates(n, seed=42, space=SEARCH_SPACE):
+    """n distinct random configurations from the search space (fewer if the space is smaller)."""
+    rng = random.Random(seed)
+    size = math.prod(len(values) for values in space.values())
+    candidates, seen = [], set()
+    while len(candidates) < min(n, size):
+        params = {name: rng.choice(values) for name, values in space.items()}
+        key = tuple(sorted(params.items()))
+        if key not in seen:
+            seen.add(key)
+            candidates.append(params)
+    return candidates
+
+
+def measure_latency(model, X, repeat=200, batch_rows=1000):
+    """Single-row predict latency (p50, p99 in ms) and batch latency in ms per 1000 rows."""
+    timings = []
+    for i in range(repeat):
+        row = X[i % len(X)][None, :]
+        start = time.perf_counter()
+        model.predict(row)
+        timings.append((time.perf_counter() - start) * 1000)
+    batch = X[:batch_rows]
+    start = time.perf_counter()
+    model.predict(batch)
+    batch_ms = (time.perf_counter() - start) * 1000 * 1000 / len(batch)
+    return float(np.percentile(timings, 50)), float(np.percentile(timings, 99)), batch_ms
+
+
+def evaluate(candidate_id, params, n_estimators, early_stopping_rounds, random_state=42):
+    """Fits one configuration with early stopping on the validation split and scores it (runs in a worker)."""
+    X_train, y_train, X_val, y_val = _DATA
+    start = time.perf_counter()
+    model = XGBRegressor(n_estimators=n_estimators, early_stopping_rounds=early_stopping_rounds,
+                         random_state=random_state, n_jobs=1, **params)
+    model.fit(X_train, y_train, eval_set=[(X_val, y_val)], verbose=False)
+    fit_seconds = time.perf_counter() - start
+    p50, p99, batch_ms = measure_latency(model, X_val)
+    return {
+        'candidate': candidate_id,
+        'n_estimators': n_estimators,
+        'best_iteration': int(model.best_iteration),
+        'val_mae': float(mean_absolute_error(y_val, model.predict(X_val))),
+        'fit_seconds': fit_seconds,
+        'single_row_p50_ms': p50,
+        'single_row_p99_ms': p99,
+        'batch_ms_per_1k': batch_ms,
+        **params,
+    }
+
+
+def meets_slo(result, latency_slo_ms):
+    return latency_slo_ms is None or result['single_row_p99_ms'] <= latency_slo_ms
+
+
+def promote(scored, keep, latency_slo_ms=None):
+    """Candidate ids of the `keep` best results: those within the latency SLO first, then by validation MAE."""
+    ordered = sorted(scored, key=lambda r: (not meets_slo(r, latency_slo_ms), r['val_mae']))
+    return [r['candidate'] for r in ordered[:keep]]
+
+
+def successive_halving(X_train, y_train, X_val, y_val, n_candidates=27, max_estimators=500, eta=3, rungs=3,
+                       early_stopping_rounds=20, budget_seconds=None, workers=None, seed=42, latency_slo_ms=None,
+                       log=print):
+    """
+    Runs successive halving over random candidates in a process pool. Every rung fits the survivors
+    with n_estimators = max_estimators / eta**(remaining rungs) and keeps the best 1/eta (see
+    promote: within latency_slo_ms first, then by validation MAE). Within a fit, early stopping ends
+    a configuration once it stops improving.
+
+    When budget_seconds runs out, queued fits are cancelled, running fits are allowed to finish and
+    no further rungs start. Returns one result per candidate, taken from the highest rung it reached.
+    """
+    deadline = time.time() + budget_seconds if budget_seconds else None
+    candidates = dict(enumerate(sample_candidates(n_candidates, seed)))
+    survivors = list(candidates)
+    latest = {}
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(X_train, y_train, X_val, y_val)) as pool:
+        for rung in range(rungs):
+            n_estimators = max(1, int(round(max_estimators / eta ** (rungs - 1 - rung))))
+            futures = [pool.submit(evaluate, cid, candidates[cid], n_estimators, early_stopping_rounds)
+                       for cid in survivors]
+            timeout = max(0.0, deadline - time.time()) if deadline else None
+            done, pending = wait(futures, timeout=timeout)
+            for future in pending:
+                future.cancel()
+            if pending:
+                # Fits that already started still finish; wait for them so their results count
+                done |= wait([f for f in pending if not f.cancelled()])[0]
+            scored = []
+            for future in done:
+                if future.cancelled() or future.exception() is not None:
+                    continue
+                result = dict(future.result(), rung=rung)
+                latest[result['candidate']] = result
+                scored.append(result)
+            log(f"rung {rung}: {len(scored)}/{len(survivors)} candidates at n_estimators={n_estimators}, "
+                f"best val MAE {min((r['val_mae'] for r in scored), default=float('nan')):.4f}")
+            if pending or (deadline and time.time() >= deadline):
+                log("time budget exhausted, stopping the search")
+                break
+            survivors = promote(scored, max(1, math.ceil(len(scored) / eta)), latency_slo_ms)
+    return list(latest.values())
+
+
+def rank(results, latency_slo_ms=None):
+    """
+    Orders results by whether single-row p99 latency meets the SLO, then by highest rung reached,
+    then by validation MAE. The first entry is the recommended configuration, so a candidate within
+    the SLO wins over one that went further in the search but is too slow.
+    """
+    for result in results:
+        result['meets_slo'] = meets_slo(result, latency_slo_ms)
+    ranked = sorted(results, key=lambda r: (not r['meets_slo'], -r['rung'], r['val_mae']))
+    for position, result in enumerate(ranked, 1):
+        result['rank'] = position
+    return ranked
+
+
+def write_leaderboard(ranked, directories):
+    for directory in directories:
+        with open(os.path.join(directory, LEADERBOARD_FILE), 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=LEADERBOARD_COLUMNS, extrasaction='ignore')
+            writer.writeheader()
+            for result in ranked:
+                writer.writerow({k: round(v, 6) if isinstance(v, float) else v for k, v in result.items()})
+
+
+def best_params(result):
+    """XGBRegressor keyword arguments for a leaderboard entry, sized to its early-stopped tree count."""
+    params = {name: result[name] for name in SEARCH_SPACE}
+    params['n_estimators'] = result['best_iteration'] + 1
+    return params
+
+
+def add_arguments(parser):
+    """Adds the --tune options shared by both training scripts."""
+    parser.add_argument('--tune', action='store_true', help='Run a hyperparameter search before the final fit')
+    parser.add_argument('--trials', type=int, default=27, help='Random candidates in the first rung')
+    parser.add_argument('--max-estimators', type=int, default=500, help='Trees per candidate in the last rung')
+    parser.add_argument('--budget', type=float, default=600, help='Wall-clock budget for the search in seconds')
+    parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: all cores)')
+    parser.add_argument('--latency-slo-ms', type=float, default=None,
+                        help='Prefer candidates whose single-row p99 predict latency is at most this')
+
+
+def tune(args, X_train, y_train, directories, validation_size=0.2, random_state=42):
+    """
+    Splits a validation set off X_train, runs the search and writes the leaderboard to each of
+    directories. Returns XGBRegressor keyword arguments for the recommended configuration.
+    """
+    from sklearn.model_selection import train_test_split
+    X_fit, X_val, y_fit, y_val = train_test_split(np.asarray(X_train), np.asarray(y_train),
+                                                  test_size=validation_size, random_state=random_state)
+    results = successive_halving(X_fit, y_fit, X_val, y_val, n_candidates=args.trials,
+                                 max_estimators=args.max_estimators, budget_seconds=args.budget,
+                                 workers=args.workers, seed=random_state, latency_slo_ms=args.latency_slo_ms)
+    if not results:
+        raise RuntimeError('Hyperparameter search produced no results; increase --budget')
+    ranked = rank(results, args.latency_slo_ms)
+    write_leaderboard(ranked, directories)
+    best = ranked[0]
+    if not best['meets_slo']:
+        print(f"No candidate meets the {args.latency_slo_ms}ms single-row p99 SLO; using the most accurate one")
+    print(f"Selected candidate {best['candidate']}: val MAE {best['val_mae']:.4f}, "
+          f"single-row p99 {best['single_row_p99_ms']:.3f}ms, params {best_params(best)}")
+    return best_params(best)
@@ -0,0 +1,151 @@
+import bisect
+import threading
+import time
+
+# Latency buckets in seconds, from 10us up to 5s
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class StageTimer:
+    """
+    Attributes elapsed time to named stages. mark(stage) charges the time since the previous mark
+    to that stage, so instrumenting a code path costs one perf_counter call per stage.
+    """
+    __slots__ = ('stages', '_last')
+
+    def __init__(self):
+        self.stages = {}
+        self._last = time.perf_counter()
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self._last
+        self._last = now
+
+    def skip(self):
+        """Restarts the clock without charging the elapsed time to any stage."""
+        self._last = time.perf_counter()
+
+    def as_ms(self):
+        return {stage: round(seconds * 1000, 4) for stage, seconds in self.stages.items()}
+
+
+class _NullTimer:
+    """Stand-in for StageTimer when a caller does not collect timings."""
+    __slots__ = ()
+
+    def mark(self, stage):
+        pass
+
+    def skip(self):
+        pass
+
+
+NULL_TIMER = _NullTimer()
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style. Not locked; MetricsRegistry serializes access."""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value):
+    # Prometheus text format: backslash, double quote and newline are escaped in label values
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+class MetricsRegistry:
+    """Request counters, error counters and per-stage latency histograms rendered as Prometheus text."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._stages = {}
+        self._requests = {}
+        self._errors = {}
+        self._info = {}
+        self._histograms = {}
+
+    def observe_request(self, endpoint, status, stages, error_type=None):
+        """Records one finished request: its stage timings, its status and (for failures) the error type."""
+        with self._lock:
+            for stage, seconds in stages.items():
+                histogram = self._stages.get((endpoint, stage))
+                if histogram is None:
+                    histogram = self._stages[(endpoint, stage)] = Histogram(self.buckets)
+                histogram.observe(seconds)
+            key = (endpoint, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+            if error_type is not None:
+                key = (endpoint, error_type)
+                self._errors[key] = self._errors.get(key, 0) + 1
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        """Registers a free-standing histogram (no-op if it exists) for use with observe()."""
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = (help_text, Histogram(buckets))
+
+    def observe(self, name, value):
+        with self._lock:
+            self._histograms[name][1].observe(value)
+
+    def set_info(self, name, help_text, labels):
+        """Sets an info-style gauge (value 1) such as the loaded model versions."""
+        with self._lock:
+            self._info[name] = (help_text, labels)
+
+    def _render_histogram(self, lines, name, labels, histogram):
+        prefix = labels + ',' if labels else ''
+        suffix = f'{{{labels}}}' if labels else ''
+        cumulative = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {histogram.count}')
+        lines.append(f'{name}_sum{suffix} {histogram.sum:.9f}')
+        lines.append(f'{name}_count{suffix} {histogram.count}')
+
+    def render(self):
+        with self._lock:
+            lines = [
+                '# HELP prediction_requests_total Requests handled, by endpoint and HTTP status.',
+                '# TYPE prediction_requests_total counter',
+            ]
+            for (endpoint, status), count in sorted(self._requests.items()):
+                lines.append(f'prediction_requests_total{{{_labels(endpoint=endpoint, status=status)}}} {count}')
+            lines += [
+                '# HELP prediction_errors_total Failed requests, by endpoint and error type.',
+                '# TYPE prediction_errors_total counter',
+            ]
+            for (endpoint, error_type), count in sorted(self._errors.items()):
+                lines.append(f'prediction_errors_total{{{_labels(endpoint=endpoint, type=error_type)}}} {count}')
+            lines += [
+                '# HELP prediction_stage_seconds Time spent per request stage.',
+                '# TYPE prediction_stage_seconds histogram',
+            ]
+            for (endpoint, stage), histogram in sorted(self._stages.items()):
+                self._render_histogram(lines, 'prediction_stage_seconds', _labels(endpoint=endpoint, stage=stage), histogram)
+            for name, (help_text, histogram) in sorted(self._histograms.items()):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                self._render_histogram(lines, name, '', histogram)
+            for name, (help_text, labels) in sorted(self._info.items()):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+                for label_set in labels:
+                    lines.append(f'{name}{{{_labels(**label_set)}}} 1')
+            return '\n'.join(lines) + '\n'
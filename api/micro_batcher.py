@@ -0,0 +1,113 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+# Batch size buckets (items) and wait buckets (seconds) for the micro-batching histograms
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+BATCH_WAIT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-row predictions into one vectorized model call.
+
+    Request threads call submit(bundle, features) and block on the result. A worker thread takes
+    the first queued row, keeps collecting until window_ms has passed since that row arrived or
+    max_batch rows are gathered, then calls score(bundle, rows) once per bundle in the group and
+    hands each row its own output. Grouping by bundle keeps rows queued across a hot reload on
+    the model they were engineered for.
+
+    A request never waits on a worker that is not there: submit() starts the worker if it is not
+    running, and scores the row itself if no result arrives within timeout_ms.
+    """
+    def __init__(self, score, window_ms=2.0, max_batch=64, metrics=None, name='micro-batcher', timeout_ms=1000.0):
+        self.score = score
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.metrics = metrics
+        self.name = name
+        self.timeout = timeout_ms / 1000.0
+        # Rows scored on the request thread because the worker did not answer in time
+        self.fallbacks = 0
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        if metrics is not None:
+            metrics.histogram('micro_batch_size', 'Rows per coalesced model call.', BATCH_SIZE_BUCKETS)
+            metrics.histogram('micro_batch_wait_seconds', 'Time a row waited in the queue before scoring.', BATCH_WAIT_BUCKETS)
+
+    def start(self):
+        """Starts the worker thread (call again after a fork; threads do not survive it)."""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True, name=self.name)
+                self._thread.start()
+
+    def submit(self, bundle, features, timeout=None):
+        """
+        Queues one feature row and blocks until its model output is ready. The worker is started
+        first if it is not running (never started, or lost in a fork). When no result arrives within
+        timeout seconds (default timeout_ms), the row is scored directly on the calling thread.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            self.start()
+        timeout = self.timeout if timeout is None else timeout
+        future = Future()
+        self._queue.put((bundle, features, future, time.perf_counter()))
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            if not future.cancel():
+                # The worker already picked the row up; give it one more timeout to finish
+                try:
+                    return future.result(timeout)
+                except FutureTimeout:
+                    pass
+        self.fallbacks += 1
+        return self.score(bundle, [features])[0]
+
+    def _collect(self):
+        first = self._queue.get()
+        batch = [first]
+        deadline = first[3] + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = []
+            try:
+                batch = self._collect()
+                self._score_batch(batch)
+            except Exception as e:
+                # Keep the worker alive; fail only the rows this batch left unanswered
+                for item in batch:
+                    if not item[2].done():
+                        item[2].set_exception(e)
+
+    def _score_batch(self, batch):
+        started = time.perf_counter()
+        groups = {}
+        for item in batch:
+            # Rows whose request already timed out and scored itself are dropped
+            if item[2].set_running_or_notify_cancel():
+                groups.setdefault(id(item[0]), []).append(item)
+        for items in groups.values():
+            try:
+                outputs = self.score(items[0][0], [item[1] for item in items])
+            except Exception as e:
+                for item in items:
+                    item[2].set_exception(e)
+                continue
+            for item, output in zip(items, outputs):
+                item[2].set_result(output)
+        if self.metrics is not None:
+            self.metrics.observe('micro_batch_size', len(batch))
+            for item in batch:
+                self.metrics.observe('micro_batch_wait_seconds', started - item[3])
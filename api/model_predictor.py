@@ -1,11 +1,56 @@
 import pandas as pd
+import io
 import os
 from datetime import datetime
 import random
+import numpy as np
+from model_registry import resolve_model_dir
+from metrics import StageTimer
+from feature_pipeline import FeaturePipeline, parse_hour
 
 # Seed the random number generator for deterministic predictions
 random.seed(42)
 
+class StaffingIndex:
+    """
+    Hash index from (date, section_id) to (employees_on_duty, workload) built from staffing rows.
+    Lookups are O(1) regardless of how many staffing days are loaded, and new days can be
+    appended without rebuilding. When a key appears more than once the first row wins, matching
+    the first-match behaviour of the previous DataFrame scan.
+    """
+    def __init__(self, staff_df=None):
+        self._rows = {}
+        if staff_df is not None:
+            self.append(staff_df)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def append(self, staff_df):
+        """Adds staffing rows (date, section_id, employees_on_duty and a workload column)."""
+        if staff_df.empty:
+            return 0
+        if 'num_documents' in staff_df.columns:
+            workload = staff_df['num_documents']
+        elif 'total_task_time_minutes' in staff_df.columns:
+            workload = staff_df['total_task_time_minutes']
+        else:
+            workload = pd.Series(5, index=staff_df.index)
+        # Keyed by datetime.date so lookups can use the memoized calendar instead of pd.to_datetime
+        keys = zip(pd.to_datetime(staff_df['date']).dt.date, staff_df['section_id'])
+        values = zip(staff_df['employees_on_duty'].tolist(), workload.tolist())
+        added = 0
+        for key, value in zip(keys, values):
+            if key not in self._rows:
+                self._rows[key] = value
+                added += 1
+        return added
+
+    def get(self, date, section_id):
+        """Returns (employees_on_duty, workload) for a datetime.date, or None when no staffing row exists."""
+        return self._rows.get((date, section_id))
+
+
 class ServiceCompletionTimePredictor:
     def __init__(self, model_dir=None, datasets_dir=None):
         """
@@ -13,7 +58,8 @@ class ServiceCompletionTimePredictor:
         """
         import joblib
         if model_dir is None:
-            model_dir = os.path.join(os.path.dirname(__file__), '../Model/Tast1')
+            # Active version of the versioned artifacts (falls back to the flat folder)
+            model_dir = resolve_model_dir(os.path.join(os.path.dirname(__file__), '../Model/Tast1'))[1]
         if datasets_dir is None:
             datasets_dir = os.path.join(os.path.dirname(__file__), 'datasets')
         self.model_dir = model_dir
@@ -22,19 +68,58 @@ class ServiceCompletionTimePredictor:
         self.scaler = joblib.load(os.path.join(model_dir, 'scaler.pkl'))
         self.le_task = joblib.load(os.path.join(model_dir, 'task_label_encoder.pkl'))
         self.le_section = joblib.load(os.path.join(model_dir, 'section_label_encoder.pkl'))
-        self.num_features = ['appointment_hour','appointment_weekday','month','staff_load_ratio','employees_on_duty']
+        # Training column order; the scaler was fitted on all seven columns
+        self.features = ['appointment_hour', 'appointment_weekday', 'month', 'task_id_encoded',
+                         'section_id_encoded', 'staff_load_ratio', 'employees_on_duty']
         # Load datasets
         self.task_df = pd.read_csv(os.path.join(datasets_dir, 'tasks.csv'))
         # Build a mapping from task_name (upper, no spaces/underscores) to task_id
         self.task_name_to_id = {}
         if 'task_name' in self.task_df.columns:
-            for _, row in self.task_df.iterrows():
-                name = str(row['task_name']).strip().upper().replace(' ', '').replace('_', '')
+            for task_name, task_id in zip(self.task_df['task_name'], self.task_df['task_id']):
+                name = str(task_name).strip().upper().replace(' ', '').replace('_', '')
                 if name and name != 'NAN':
-                    self.task_name_to_id[name] = row['task_id']
-        self.staff_df = pd.read_csv(os.path.join(datasets_dir, 'staffing_train.csv'), parse_dates=['date'])
+                    self.task_name_to_id[name] = task_id
+        # Shared feature pipeline: task_id -> section_id (first row wins), label -> code dicts, memoized calendar
+        self.pipeline = FeaturePipeline.from_encoders(self.task_df, self.le_task, self.le_section)
+        self.task_sections = self.pipeline.task_sections
+        self.task_codes = self.pipeline.task_codes
+        self.section_codes = self.pipeline.section_codes
+        # (date, section_id) -> staffing features; staffing_train.csv grows daily so remember how far it was read
+        self.staffing_file = os.path.join(datasets_dir, 'staffing_train.csv')
+        self.staffing_index = StaffingIndex()
+        self._staffing_columns = None
+        self._staffing_offset = 0
+        self.refresh_staffing()
         print("ML Predictor initialized with trained model, encoders, and datasets.")
 
+    def append_staffing(self, staff_df):
+        """Adds new staffing days to the index. Returns the number of new (date, section_id) keys."""
+        return self.staffing_index.append(staff_df)
+
+    def refresh_staffing(self):
+        """
+        Indexes rows appended to staffing_train.csv since the last call, reading only the new bytes.
+        Only newline-terminated lines are indexed: an unterminated last line may still be mid-write,
+        so the offset stays in front of it and it is indexed once its newline arrives.
+        Returns the number of new (date, section_id) keys.
+        """
+        with open(self.staffing_file, 'rb') as f:
+            if self._staffing_columns is None:
+                header = f.readline()
+                self._staffing_columns = header.decode().strip().split(',')
+                self._staffing_offset = len(header)
+            f.seek(self._staffing_offset)
+            data = f.read()
+        complete = data[:data.rfind(b'\n') + 1]
+        if not complete.strip():
+            return 0
+        self._staffing_offset += len(complete)
+        return self.append_staffing(self._read_staffing(complete))
+
+    def _read_staffing(self, data):
+        return pd.read_csv(io.BytesIO(data), names=self._staffing_columns, header=None, parse_dates=['date'])
+
     def predict_completion_time(self, date, time_str, task_id, debug=False):
         """
         Predicts service completion time in minutes using the trained ML model and real features from datasets.
@@ -42,87 +127,78 @@ class ServiceCompletionTimePredictor:
         Returns (prediction, debug_info) if debug=True, else just prediction.
         """
         debug_info = {}
+        timer = StageTimer()
         try:
             debug_info['inputs'] = {'date': date, 'time': time_str, 'task_id': task_id}
-            # Convert date to datetime
-            date_dt = pd.to_datetime(date)
-            hour = int(time_str.split(':')[0])
-            weekday = date_dt.weekday()
+            calendar = self.pipeline.calendar.get(date)
+            if calendar is None:
+                raise ValueError(f"Invalid date {date!r}")
+            month, weekday, day = calendar
+            hour = parse_hour(time_str)
+            if hour is None:
+                raise ValueError(f"Invalid time {time_str!r}")
             is_weekend = 1 if weekday >= 5 else 0
-            month = date_dt.month
             debug_info['parsed'] = {'hour': hour, 'weekday': weekday, 'is_weekend': is_weekend, 'month': month}
+            timer.mark('date_parse')
 
             # Map human-readable task_id to code if needed
             original_task_id = task_id
             mapped = False
-            if task_id not in self.task_df['task_id'].values:
+            if task_id not in self.task_sections:
                 lookup = str(task_id).strip().upper().replace(' ', '').replace('_', '')
                 if lookup in self.task_name_to_id:
                     task_id = self.task_name_to_id[lookup]
                     mapped = True
             debug_info['final_task_id'] = task_id
             debug_info['task_id_mapped'] = mapped
+            timer.mark('lookup')
 
             # Encode task_id
-            try:
-                task_id_encoded = self.le_task.transform([str(task_id)])[0]
-            except Exception as e:
-                debug_info['error'] = f"Task ID encoding failed: {e}"
+            task_id_encoded = self.task_codes.get(str(task_id))
+            if task_id_encoded is None:
+                debug_info['error'] = f"Task ID encoding failed: unknown task_id {task_id!r}"
                 if debug:
                     return 60, debug_info
                 return 60
             debug_info['task_id_encoded'] = int(task_id_encoded)
 
-            # Section id from task_df
-            section_id = 0
-            row = self.task_df.loc[self.task_df['task_id'] == task_id]
-            if not row.empty:
-                section_id = row['section_id'].values[0]
+            # Section id from the tasks table
+            section_id = self.task_sections.get(task_id, 0)
             debug_info['section_id'] = section_id
-            try:
-                section_id_encoded = self.le_section.transform([str(section_id)])[0]
-            except Exception as e:
-                debug_info['error'] = f"Section ID encoding failed: {e}"
+            section_id_encoded = self.section_codes.get(str(section_id))
+            if section_id_encoded is None:
+                debug_info['error'] = f"Section ID encoding failed: unknown section_id {section_id!r}"
                 if debug:
                     return 60, debug_info
                 return 60
             debug_info['section_id_encoded'] = int(section_id_encoded)
+            timer.mark('encode')
 
-            # Staff features from staff_df (match by date and section_id)
-            staff_row = self.staff_df[(self.staff_df['date'] == date_dt) & (self.staff_df['section_id'] == section_id)]
-            if not staff_row.empty:
-                employees_on_duty = staff_row['employees_on_duty'].values[0]
-                if 'num_documents' in staff_row.columns:
-                    num_documents = staff_row['num_documents'].values[0]
-                elif 'total_task_time_minutes' in staff_row.columns:
-                    num_documents = staff_row['total_task_time_minutes'].values[0]
-                else:
-                    num_documents = 5
-                staff_load_ratio = num_documents / (employees_on_duty + 1)
+            # Staff features from the staffing index (match by date and section_id)
+            staff_row = self.staffing_index.get(day, section_id)
+            if staff_row is not None:
+                # Same definition as training: the day's workload per employee on duty
+                employees_on_duty, workload = staff_row
+                staff_load_ratio = workload / employees_on_duty
                 debug_info['staff_row_found'] = True
             else:
-                debug_info['error'] = f"No staff row found for date={date_dt.date()}, section_id={section_id}"
-                employees_on_duty = 5
-                staff_load_ratio = 1.0
+                # Training filled missing staffing with the column means, which the scaler recorded
+                debug_info['error'] = f"No staff row found for date={day}, section_id={section_id}"
+                staff_load_ratio = float(self.scaler.mean_[5])
+                employees_on_duty = float(self.scaler.mean_[6])
                 debug_info['staff_row_found'] = False
             debug_info['employees_on_duty'] = employees_on_duty
             debug_info['staff_load_ratio'] = staff_load_ratio
+            timer.mark('staffing_lookup')
 
-            features_dict = {
-                'appointment_hour': hour,
-                'appointment_weekday': weekday,
-                'is_weekend': is_weekend,
-                'month': month,
-                'staff_load_ratio': staff_load_ratio,
-                'employees_on_duty': employees_on_duty,
-                'task_id_encoded': task_id_encoded,
-                'section_id_encoded': section_id_encoded
-            }
-            debug_info['features'] = features_dict
-            input_df = pd.DataFrame([features_dict])
-            input_df[self.num_features] = self.scaler.transform(input_df[self.num_features])
-            predicted_minutes = self.model.predict(input_df)[0]
+            row = self.pipeline.service_row(date, time_str, task_id, staff_load_ratio, employees_on_duty)
+            debug_info['features'] = dict(zip(self.features, row))
+            X_scaled = self.scaler.transform(np.array([row], dtype=float))
+            timer.mark('scale')
+            predicted_minutes = self.model.predict(X_scaled)[0]
+            timer.mark('predict')
             debug_info['model_output'] = float(predicted_minutes)
+            debug_info['timings'] = timer.as_ms()
             if debug:
                 return round(float(predicted_minutes), 2), debug_info
             return round(float(predicted_minutes), 2)
@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+from datetime import datetime
+
+# Each task folder (Model/Tast1, Model/Task2) can hold versioned artifact directories:
+#   <task_dir>/versions/<version>/...   one complete set of model artifacts
+#   <task_dir>/ACTIVE                   name of the version to serve
+# New versions are written to a hidden staging directory and only renamed into versions/ when
+# activated, so a poller never loads a half-written version.
+# Folders without versions/ are served as a single "legacy" version from the task folder itself.
+VERSIONS_DIR = 'versions'
+ACTIVE_FILE = 'ACTIVE'
+
+
+def _staging_dir(task_dir, version):
+    return os.path.join(task_dir, VERSIONS_DIR, f".staging-{version}")
+
+
+def new_version_dir(task_dir):
+    """Creates a staging directory for a new timestamped version. Returns (version, path)."""
+    base = datetime.now().strftime('%Y%m%d-%H%M%S')
+    version, suffix = base, 1
+    while os.path.exists(os.path.join(task_dir, VERSIONS_DIR, version)) or os.path.exists(_staging_dir(task_dir, version)):
+        suffix += 1
+        version = f"{base}-{suffix}"
+    path = _staging_dir(task_dir, version)
+    os.makedirs(path)
+    return version, path
+
+
+def activate_version(task_dir, version):
+    """
+    Publishes a staged version (if any) and points ACTIVE at it. Both steps are atomic renames,
+    so readers see either the old or the new version, never a partial one.
+    """
+    final_dir = os.path.join(task_dir, VERSIONS_DIR, version)
+    if os.path.isdir(_staging_dir(task_dir, version)):
+        os.replace(_staging_dir(task_dir, version), final_dir)
+    if not os.path.isdir(final_dir):
+        raise ValueError(f"Unknown model version {version!r} in {task_dir}")
+    tmp_path = os.path.join(task_dir, f".{ACTIVE_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w') as f:
+        f.write(version + '\n')
+    os.replace(tmp_path, os.path.join(task_dir, ACTIVE_FILE))
+
+
+def resolve_model_dir(task_dir):
+    """
+    Returns (version, model_dir) for the artifacts that should be served: the version named in
+    ACTIVE, else the newest directory under versions/, else the task folder itself.
+    """
+    versions_root = os.path.join(task_dir, VERSIONS_DIR)
+    active_path = os.path.join(task_dir, ACTIVE_FILE)
+    if os.path.exists(active_path):
+        with open(active_path) as f:
+            version = f.read().strip()
+        if version and os.path.isdir(os.path.join(versions_root, version)):
+            return version, os.path.join(versions_root, version)
+    if os.path.isdir(versions_root):
+        versions = sorted(v for v in os.listdir(versions_root)
+                          if not v.startswith('.') and os.path.isdir(os.path.join(versions_root, v)))
+        if versions:
+            return versions[-1], os.path.join(versions_root, versions[-1])
+    mtimes = [os.path.getmtime(os.path.join(task_dir, f)) for f in os.listdir(task_dir) if f.endswith('.pkl')]
+    return f"legacy-{int(max(mtimes, default=0))}", task_dir
+
+
+class ModelRegistry:
+    """
+    Holds the active bundle for one task folder and swaps it when a new version appears.
+
+    loader(version, model_dir) must return a fully loaded and warmed-up bundle (a dict with at
+    least a 'version' key). Loading happens off the request path; the swap is a single reference
+    assignment, so a request that already called current() finishes on the bundle it started with.
+    """
+    def __init__(self, task_dir, loader, logger=None):
+        self.task_dir = task_dir
+        self.loader = loader
+        self.logger = logger
+        self._reload_lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        version, model_dir = resolve_model_dir(task_dir)
+        self._bundle = loader(version, model_dir)
+        self.loaded_at = time.time()
+
+    def current(self):
+        return self._bundle
+
+    @property
+    def version(self):
+        return self._bundle['version']
+
+    def check_for_update(self):
+        """Loads and swaps in the resolved version if it differs from the active one. Returns True on swap."""
+        with self._reload_lock:
+            version, model_dir = resolve_model_dir(self.task_dir)
+            if version == self._bundle['version']:
+                return False
+            bundle = self.loader(version, model_dir)
+            previous = self._bundle['version']
+            self._bundle = bundle
+            self.loaded_at = time.time()
+        if self.logger:
+            self.logger.info("Model in %s swapped from %s to %s", self.task_dir, previous, version)
+        return True
+
+    def replace(self, bundle):
+        """Serves an already loaded bundle until the next swap (benchmarks pin a candidate this way)."""
+        with self._reload_lock:
+            self._bundle = bundle
+            self.loaded_at = time.time()
+
+    def start(self, interval):
+        """Starts a daemon thread that calls check_for_update every interval seconds."""
+        if interval <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._poll, args=(interval,), daemon=True,
+                                        name=f"model-registry-{os.path.basename(os.path.normpath(self.task_dir))}")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _poll(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.check_for_update()
+            except Exception:
+                # A broken artifact must not take down serving; keep the current bundle and retry later
+                if self.logger:
+                    self.logger.exception("Model reload from %s failed", self.task_dir)
@@ -0,0 +1,67 @@
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Thread-safe bounded LRU cache for model outputs, keyed on (model version, engineered feature
+    tuple). Nothing is cleared when the model changes: during a hot swap, requests still running on
+    the old bundle and new ones on the new bundle each hit their own entries, and the old version's
+    entries age out of the LRU. A maxsize of 0 disables caching.
+    """
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        # Newest model version inserted, and every version seen (in-flight old requests do not move it back)
+        self.version = None
+        self._versions = set()
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, version):
+        """Returns the cached value or None, counting a hit or a miss."""
+        with self._lock:
+            value = self._data.get((version, key))
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end((version, key))
+            self.hits += 1
+            return value
+
+    def put(self, key, value, version):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            if version not in self._versions:
+                # A new model version; the previous version's entries are left to age out
+                if self._versions:
+                    self.invalidations += 1
+                self._versions.add(version)
+                self.version = version
+            self._data[(version, key)] = value
+            self._data.move_to_end((version, key))
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'model_version': self.version,
+            }
@@ -0,0 +1,318 @@
+import argparse
+import asyncio
+import csv
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Responses worth retrying: rate limited, or the server/proxy failed rather than rejected the input
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+SERVICE_RESULT = 'expected_completion_time_minutes'
+STAFFING_RESULT = 'predicted_employee_count'
+
+
+class PredictionError(Exception):
+    """A request the API rejected (4xx) or that still failed after all retries."""
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class _TTLCache:
+    """Thread-safe LRU of successful predictions; entries expire so a hot-reloaded model is picked up."""
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[1] < self.ttl):
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+
+def _hour(time_str):
+    """Hour of an 'HH:MM' string, the only part of the time the service model uses."""
+    text = str(time_str)
+    head = text.split(':', 1)[0]
+    return int(head) if head.isdigit() else text
+
+
+def service_key(date, time_str, task_id):
+    # 09:05 and 09:55 on the same day and task get the same prediction
+    return 'service', str(date), _hour(time_str), str(task_id)
+
+
+def staffing_key(date, section_id):
+    return 'staffing', str(date), str(section_id).upper()
+
+
+class PredictionClient:
+    """
+    Client for the prediction API, for jobs that score many rows.
+
+    One keep-alive session is shared by all calls. Lists of rows are de-duplicated against a
+    client-side cache, split into batch_size chunks for the /batch endpoints, and sent with at
+    most max_in_flight requests open at once. Connection errors, timeouts and 429/5xx responses are
+    retried up to `retries` times with exponential backoff and jitter (honouring Retry-After).
+    Every endpoint used is read-only, so retrying is safe.
+    """
+    def __init__(self, base_url='http://localhost:5000', timeout=10.0, batch_size=1000, max_in_flight=4,
+                 retries=3, backoff=0.2, cache_size=100000, cache_ttl=300.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = _TTLCache(cache_size, cache_ttl)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix='prediction-client')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._pool.shutdown(wait=True)
+        self.session.close()
+
+    def _request(self, method, path, **kwargs):
+        """JSON response of one call, retried on transient failures. Raises PredictionError otherwise."""
+        url = self.base_url + path
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.retries:
+                    raise PredictionError(f"{method} {path} failed after {attempt + 1} attempts: {e}") from e
+            else:
+                if response.status_code < 400:
+                    return response.json()
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    try:
+                        message = response.json().get('error', response.text)
+                    except ValueError:
+                        message = response.text
+                    raise PredictionError(f"{method} {path} returned {response.status_code}: {message}",
+                                          response.status_code)
+                retry_after = response.headers.get('Retry-After', '')
+                if retry_after.isdigit():
+                    delay = float(retry_after)
+            time.sleep(delay)
+
+    # --- single rows ---
+
+    def predict_service_time(self, date, time_str, task_id):
+        """Expected completion time in minutes for one booking."""
+        key = service_key(date, time_str, task_id)
+        minutes = self.cache.get(key)
+        if minutes is None:
+            minutes = self._request('POST', '/predict_service_time',
+                                    json={'date': date, 'time': time_str, 'task_id': task_id})[SERVICE_RESULT]
+            self.cache.put(key, minutes)
+        return minutes
+
+    def predict_staffing(self, date, section_id):
+        """Predicted employee count for one section on one date."""
+        key = staffing_key(date, section_id)
+        count = self.cache.get(key)
+        if count is None:
+            count = self._request('POST', '/predict_staffing',
+                                  json={'date': date, 'section_id': section_id})[STAFFING_RESULT]
+            self.cache.put(key, count)
+        return count
+
+    # --- many rows ---
+
+    def _score_many(self, path, rows, fields, key_fn, result_field):
+        """
+        Results for a list of row dicts, in input order, as returned by the batch endpoint:
+        {result_field: value} or {'error': message}. Only distinct uncached keys are sent.
+        """
+        results = [None] * len(rows)
+        pending = {}
+        for i, row in enumerate(rows):
+            key = key_fn(*(row[f] for f in fields))
+            value = self.cache.get(key)
+            if value is not None:
+                results[i] = {result_field: value}
+            else:
+                pending.setdefault(key, []).append(i)
+
+        keys = list(pending)
+        chunks = [keys[start:start + self.batch_size] for start in range(0, len(keys), self.batch_size)]
+
+        def send(chunk):
+            items = [{f: rows[pending[key][0]][f] for f in fields} for key in chunk]
+            return chunk, self._request('POST', path, json={'items': items})['predictions']
+
+        # The pool's max_in_flight workers bound the number of open requests
+        for chunk, predictions in self._pool.map(send, chunks):
+            for key, prediction in zip(chunk, predictions):
+                prediction.pop('row_id', None)
+                if result_field in prediction:
+                    self.cache.put(key, prediction[result_field])
+                for i in pending[key]:
+                    results[i] = dict(prediction)
+        return results
+
+    def predict_service_times(self, rows):
+        """Service time results for dicts with date, time and task_id (e.g. csv.DictReader rows)."""
+        return self._score_many('/predict_service_time/batch', rows, ('date', 'time', 'task_id'),
+                                service_key, SERVICE_RESULT)
+
+    def predict_staffing_many(self, rows):
+        """Staffing results for dicts with date and section_id."""
+        return self._score_many('/predict_staffing/batch', rows, ('date', 'section_id'),
+                                staffing_key, STAFFING_RESULT)
+
+    def health(self):
+        return self._request('GET', '/health')
+
+
+class AsyncPredictionClient:
+    """
+    asyncio interface with the same methods as PredictionClient, as coroutines. Calls run on the
+    wrapped client's pooled session in a thread executor; a semaphore keeps at most max_in_flight
+    of them running, on top of the per-call chunk limit.
+    """
+    def __init__(self, base_url='http://localhost:5000', **kwargs):
+        self.client = PredictionClient(base_url, **kwargs)
+        self._executor = ThreadPoolExecutor(max_workers=self.client.max_in_flight,
+                                            thread_name_prefix='prediction-client-async')
+        self._semaphore = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        await asyncio.get_running_loop().run_in_executor(None, self._shutdown)
+
+    def _shutdown(self):
+        self._executor.shutdown(wait=True)
+        self.client.close()
+
+    async def _call(self, fn, *args):
+        if self._semaphore is None:
+            # Created lazily so it binds to the running loop
+            self._semaphore = asyncio.Semaphore(self.client.max_in_flight)
+        async with self._semaphore:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def predict_service_time(self, date, time_str, task_id):
+        return await self._call(self.client.predict_service_time, date, time_str, task_id)
+
+    async def predict_staffing(self, date, section_id):
+        return await self._call(self.client.predict_staffing, date, section_id)
+
+    async def predict_service_times(self, rows):
+        return await self._call(self.client.predict_service_times, rows)
+
+    async def predict_staffing_many(self, rows):
+        return await self._call(self.client.predict_staffing_many, rows)
+
+    async def health(self):
+        return await self._call(self.client.health)
+
+
+def main():
+    from benchmark_api import TASK1_FILE, TASK2_FILE, start_server
+
+    parser = argparse.ArgumentParser(description='Score the test inputs through PredictionClient and check them against single requests.')
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--start-server', action='store_true', help='Start app.py locally on --port for the run')
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--max-in-flight', type=int, default=4)
+    parser.add_argument('--check', type=int, default=200, help='Rows compared with single requests')
+    args = parser.parse_args()
+
+    proc = None
+    if args.start_server:
+        proc, args.url = start_server(args.port, None)
+    try:
+        with open(TASK1_FILE, newline='') as f:
+            service_rows = list(csv.DictReader(f))
+        with open(TASK2_FILE, newline='') as f:
+            staffing_rows = list(csv.DictReader(f))
+        with PredictionClient(args.url, batch_size=args.batch_size, max_in_flight=args.max_in_flight) as client:
+            for name, rows, score in (('service', service_rows, client.predict_service_times),
+                                      ('staffing', staffing_rows, client.predict_staffing_many)):
+                for run in ('cold', 'cached'):
+                    start = time.perf_counter()
+                    results = score(rows)
+                    elapsed = time.perf_counter() - start
+                    errors = sum('error' in r for r in results)
+                    print(f"{name:8s} {run:6s} {len(rows)} rows in {elapsed:.3f}s ({len(rows) / elapsed:,.0f} rows/s, {errors} errors)")
+
+            # Batch results must match what the single-row endpoints return
+            client.cache.clear()
+            sample = random.Random(0).sample(service_rows, min(args.check, len(service_rows)))
+            batch = client.predict_service_times(sample)
+            client.cache.clear()
+            single = [client.predict_service_time(r['date'], r['time'], r['task_id']) for r in sample]
+            mismatches = sum(b.get(SERVICE_RESULT) != s for b, s in zip(batch, single))
+            print(f"batch vs single requests: {len(sample) - mismatches}/{len(sample)} identical; cache {client.cache.stats()}")
+
+        async def score_async():
+            async with AsyncPredictionClient(args.url, batch_size=args.batch_size,
+                                             max_in_flight=args.max_in_flight, cache_size=0) as client:
+                halves = [service_rows[:len(service_rows) // 2], service_rows[len(service_rows) // 2:]]
+                return await asyncio.gather(*(client.predict_service_times(rows) for rows in halves))
+
+        start = time.perf_counter()
+        results = [r for half in asyncio.run(score_async()) for r in half]
+        elapsed = time.perf_counter() - start
+        print(f"async    uncached {len(results)} rows in {elapsed:.3f}s ({len(results) / elapsed:,.0f} rows/s)")
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == '__main__':
+    main()
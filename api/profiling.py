@@ -0,0 +1,117 @@
+import collections
+import os
+import sys
+import threading
+import time
+
+# Upper bounds for one profiling run, so an admin call cannot pin a worker indefinitely. The run
+# holds a request thread for its whole length; 30s stays well inside gunicorn's 60s worker timeout.
+MAX_PROFILE_SECONDS = 30.0
+MIN_INTERVAL_SECONDS = 0.001
+
+
+class ProfilerBusy(Exception):
+    """Raised when a profiling run is requested while another one is in progress."""
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for every thread in the process. While run() is active, the calling
+    thread wakes every interval, reads all other threads' current frames with sys._current_frames()
+    and counts each distinct stack. Nothing is installed in the other threads (no sys.setprofile
+    or settrace hooks), so requests run at full speed and there is no cost at all between runs.
+
+    Stacks are returned in the collapsed format read by flamegraph.pl, speedscope and
+    inferno: "thread;outer_fn (file.py:line);...;inner_fn (file.py:line) count".
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        # code object -> "name (file:line)" label, so a frame is formatted once per run, not per
+        # sample; cleared after each run so code objects from reloaded models are not kept alive
+        self._labels = {}
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def run(self, seconds, interval=0.005):
+        """Samples for `seconds`. Returns (Counter of collapsed stack -> samples, number of sampling passes)."""
+        seconds = min(max(seconds, 0.0), MAX_PROFILE_SECONDS)
+        interval = max(interval, MIN_INTERVAL_SECONDS)
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy('A profiling run is already in progress')
+        try:
+            own = threading.get_ident()
+            stacks = collections.Counter()
+            passes = 0
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(self._label(frame.f_code))
+                        frame = frame.f_back
+                    labels.append(names.get(ident, f"thread-{ident}"))
+                    stacks[';'.join(reversed(labels))] += 1
+                passes += 1
+                time.sleep(interval)
+            return stacks, passes
+        finally:
+            self._labels.clear()
+            self._lock.release()
+
+
+def collapsed(stacks):
+    """Counter of stacks as collapsed-format text, heaviest stacks first."""
+    return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class SlowRequestLog:
+    """
+    Bounded ring buffer of requests slower than threshold_ms, with their inputs and stage timings.
+    The per-request cost is one comparison; only slow requests pay for building an entry.
+    """
+    def __init__(self, threshold_ms=500.0, capacity=200):
+        self.threshold_ms = threshold_ms
+        self._entries = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.captured = 0
+
+    @property
+    def capacity(self):
+        return self._entries.maxlen
+
+    def is_slow(self, duration_ms):
+        return self.threshold_ms > 0 and duration_ms >= self.threshold_ms
+
+    def record(self, entry):
+        with self._lock:
+            self._entries.append(entry)
+            self.captured += 1
+
+    def entries(self, limit=None, endpoint=None):
+        """Captured entries, newest first, optionally filtered by endpoint."""
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        if endpoint:
+            entries = [e for e in entries if e['endpoint'] == endpoint]
+        return entries[:limit] if limit else entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def summarize_inputs(data, max_items=20):
+    """Request body for a slow-request entry; batches are cut to their first max_items items."""
+    items = data.get('items') if isinstance(data, dict) and isinstance(data.get('items'), list) else data
+    if isinstance(items, list) and len(items) > max_items:
+        return {'items': items[:max_items], 'total_items': len(items)}
+    return data
@@ -0,0 +1,77 @@
+import os
+import numpy as np
+from feature_pipeline import DEFAULT_STAFF_LOAD_RATIO, DEFAULT_EMPLOYEES_ON_DUTY
+
+# With the placeholder staffing features the service model only sees (hour, weekday, month,
+# task_id) -- the section follows from the task -- so every prediction fits in a
+# 24 x 7 x 12 x n_tasks array of minutes.
+SERVICE_GRID_FILE = 'service_time_grid.npz'
+HOURS = 24
+
+
+def task_section_codes(features):
+    """Section code per task code from a FeaturePipeline; -1 for tasks that cannot be scored."""
+    codes = np.full(len(features.task_codes), -1, dtype=int)
+    for task_id, task_code in features.task_codes.items():
+        codes[task_code] = features.section_codes.get(features.task_sections.get(task_id), -1)
+    return codes
+
+
+def build_service_grid(model, scaler, features):
+    """
+    Scores every (hour, weekday, month, task) combination with placeholder staffing features in
+    one scaler/model call. Returns the minutes as a (24, 7, 12, n_tasks) array indexed by
+    [hour, weekday, month - 1, task code]; tasks without a known section are left at 0.
+    """
+    sections = task_section_codes(features)
+    tasks = np.flatnonzero(sections >= 0)
+    hour, weekday, month, task = np.meshgrid(np.arange(HOURS), np.arange(7), np.arange(1, 13), tasks, indexing='ij')
+    X = np.column_stack([hour.ravel(), weekday.ravel(), month.ravel(), task.ravel(), sections[task.ravel()],
+                         np.full(task.size, DEFAULT_STAFF_LOAD_RATIO), np.full(task.size, DEFAULT_EMPLOYEES_ON_DUTY)])
+    minutes = np.maximum(1, np.round(model.predict(scaler.transform(X.astype(float))))).astype(int)
+    grid = np.zeros((HOURS, 7, 12, len(sections)), dtype=int)
+    grid[:, :, :, tasks] = minutes.reshape(HOURS, 7, 12, len(tasks))
+    # Minutes are small positive integers; uint16 keeps the array a quarter of the int64 size
+    return grid.astype(np.uint16) if grid.max() <= np.iinfo(np.uint16).max else grid
+
+
+def save_service_grid(grid, features, model_dir):
+    path = os.path.join(model_dir, SERVICE_GRID_FILE)
+    np.savez(path, minutes=grid, section_codes=task_section_codes(features))
+    return path
+
+
+def load_service_grid(model_dir, model, scaler, features):
+    """
+    Loads the grid saved next to xgb_service_completion_model.pkl. It is rebuilt from the model
+    when missing, older than the model file, or built for a different task -> section mapping.
+    """
+    path = os.path.join(model_dir, SERVICE_GRID_FILE)
+    model_path = os.path.join(model_dir, 'xgb_service_completion_model.pkl')
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(model_path):
+        with np.load(path) as saved:
+            if np.array_equal(saved['section_codes'], task_section_codes(features)):
+                return saved['minutes']
+    return build_service_grid(model, scaler, features)
+
+
+def lookup_minutes(grid, features):
+    """Minutes for one service feature tuple, or None when it carries real staffing features."""
+    hour, weekday, month, task_code, _, staff_load_ratio, employees_on_duty = features
+    if staff_load_ratio != DEFAULT_STAFF_LOAD_RATIO or employees_on_duty != DEFAULT_EMPLOYEES_ON_DUTY:
+        return None
+    return int(grid[hour, weekday, month - 1, task_code])
+
+
+def grid_minutes(grid, X, predict):
+    """
+    Minutes for a service feature matrix: grid lookups for rows with the placeholder staffing
+    features, predict(rows) (raw model output) for the rest.
+    """
+    placeholder = (X[:, 5] == DEFAULT_STAFF_LOAD_RATIO) & (X[:, 6] == DEFAULT_EMPLOYEES_ON_DUTY)
+    minutes = np.empty(len(X), dtype=int)
+    keys = X[placeholder, :4].astype(int)
+    minutes[placeholder] = grid[keys[:, 0], keys[:, 1], keys[:, 2] - 1, keys[:, 3]]
+    if not placeholder.all():
+        minutes[~placeholder] = np.maximum(1, np.round(predict(X[~placeholder])))
+    return minutes
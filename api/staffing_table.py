@@ -0,0 +1,80 @@
+import os
+import random
+import joblib
+import numpy as np
+
+# The staffing model only sees (month, weekday, section_id), so every possible
+# prediction fits in a 12 x 7 x n_sections table.
+STAFFING_TABLE_FILE = 'staffing_forecast_table.pkl'
+MONTHS = range(1, 13)
+WEEKDAYS = range(7)
+
+
+def build_staffing_table(model, scaler, le_section):
+    """
+    Scores every (month, weekday, section_id) combination with one scaler/model call.
+    Returns a dict mapping (month, weekday, section_id) -> predicted employee count.
+    """
+    sections = list(le_section.classes_)
+    keys = [(month, weekday, section_id) for month in MONTHS for weekday in WEEKDAYS for section_id in sections]
+    X = np.array([(month, weekday, code) for month in MONTHS for weekday in WEEKDAYS for code in range(len(sections))], dtype=float)
+    preds = model.predict(scaler.transform(X))
+    counts = np.maximum(1, np.round(preds)).astype(int)
+    return {key: int(count) for key, count in zip(keys, counts)}
+
+
+def staffing_grid(table, sections):
+    """The table as a (12, 7, len(sections)) int array indexed by [month - 1, weekday, section code]."""
+    codes = {section_id: code for code, section_id in enumerate(sections)}
+    grid = np.zeros((12, 7, len(codes)), dtype=int)
+    for (month, weekday, section_id), count in table.items():
+        grid[month - 1, weekday, codes[section_id]] = count
+    return grid
+
+
+def _live_count(model, scaler, le_section, key):
+    month, weekday, section_id = key
+    X = [[month, weekday, le_section.transform([section_id])[0]]]
+    return max(1, round(float(model.predict(scaler.transform(X))[0])))
+
+
+def check_staffing_table(table, model, scaler, le_section, sample_size=200, seed=0):
+    """
+    Compares a table against the live model without going through build_staffing_table: a
+    random sample of entries is re-scored one row at a time (LabelEncoder, scaler, model.predict),
+    the way the API scored requests before the table existed. Returns a list of
+    (key, table_value, model_value) mismatches; missing or extra keys are reported with None
+    on the missing side.
+    """
+    expected_keys = {(month, weekday, section_id) for month in MONTHS for weekday in WEEKDAYS
+                     for section_id in le_section.classes_}
+    mismatches = [(key, None, _live_count(model, scaler, le_section, key))
+                  for key in sorted(expected_keys - set(table))]
+    mismatches += [(key, table[key], None) for key in sorted(set(table) - expected_keys)]
+    keys = sorted(expected_keys & set(table))
+    for key in random.Random(seed).sample(keys, min(sample_size, len(keys))):
+        live = _live_count(model, scaler, le_section, key)
+        if live != table[key]:
+            mismatches.append((key, table[key], live))
+    return mismatches
+
+
+def save_staffing_table(table, model_dir):
+    path = os.path.join(model_dir, STAFFING_TABLE_FILE)
+    joblib.dump(table, path)
+    return path
+
+
+def load_staffing_table(model_dir, model, scaler, le_section):
+    """
+    Loads the table saved next to xgb_staffing_model.pkl. It is rebuilt from the model when
+    missing, older than the model file, or built for a different set of sections.
+    """
+    path = os.path.join(model_dir, STAFFING_TABLE_FILE)
+    model_path = os.path.join(model_dir, 'xgb_staffing_model.pkl')
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(model_path):
+        table = joblib.load(path)
+        sections = {key[2] for key in table}
+        if sections == set(le_section.classes_) and len(table) == len(MONTHS) * len(WEEKDAYS) * len(sections):
+            return table
+    return build_staffing_table(model, scaler, le_section)
@@ -1,25 +1,25 @@
-import requests
 import csv
 import os
+from prediction_client import PredictionClient
 
-API_URL = "http://localhost:5000/predict_service_time"
+API_URL = "http://localhost:5000"
 TEST_FILE = os.path.join(os.path.dirname(__file__), "datasets/task1_test_inputs.csv")
 
-results = []
 with open(TEST_FILE, newline='') as csvfile:
-    reader = csv.DictReader(csvfile)
-    for row in reader:
-        payload = {
-            "date": row["date"],
-            "time": row["time"],
-            "task_id": row["task_id"]
-        }
-        try:
-            resp = requests.post(API_URL, json=payload, timeout=5)
-            data = resp.json()
-            results.append({"row_id": row["row_id"], **payload, **data})
-        except Exception as e:
-            results.append({"row_id": row["row_id"], **payload, "error": str(e)})
+    rows = list(csv.DictReader(csvfile))
+
+# One pooled session; rows go out in batch calls, repeated (date, hour, task_id) keys only once
+with PredictionClient(API_URL) as client:
+    predictions = client.predict_service_times(rows)
+
+results = []
+for row, data in zip(rows, predictions):
+    payload = {
+        "date": row["date"],
+        "time": row["time"],
+        "task_id": row["task_id"]
+    }
+    results.append({"row_id": row["row_id"], **payload, **data})
 
 # Print first 5 results
 for r in results[:5]:
@@ -0,0 +1,55 @@
+import pytest
+
+import app as app_module
+
+TOKEN = 'test-token'
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', TOKEN)
+    return app_module.app.test_client()
+
+
+def _profile(client, query, multithread=True):
+    return client.get(f"/admin/profile?{query}", headers={'X-Admin-Token': TOKEN},
+                      environ_overrides={'wsgi.multithread': multithread})
+
+
+def test_disabled_without_token(monkeypatch):
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', '')
+    assert app_module.app.test_client().get('/admin/profile').status_code == 404
+
+
+def test_single_threaded_worker_is_refused(client):
+    response = _profile(client, 'seconds=0.05', multithread=False)
+    assert response.status_code == 409
+    assert response.get_json()['code'] == 'single_threaded_worker'
+
+
+@pytest.mark.parametrize('seconds', ['60', '0', 'abc'])
+def test_seconds_outside_the_cap_are_rejected(client, seconds):
+    response = _profile(client, f"seconds={seconds}")
+    assert response.status_code == 400
+    assert response.get_json()['code'] == 'invalid_field'
+
+
+def test_profile_on_a_threaded_worker(client):
+    response = _profile(client, 'seconds=0.05&interval_ms=5&format=json')
+    assert response.status_code == 200
+    assert response.get_json()['passes'] > 0
+
+
+def test_profiler_forgets_frame_labels_after_each_run():
+    import threading
+    from profiling import SamplingProfiler
+    stop = threading.Event()
+    worker = threading.Thread(target=stop.wait, daemon=True)
+    worker.start()
+    profiler = SamplingProfiler()
+    try:
+        stacks, passes = profiler.run(0.02, interval=0.001)
+    finally:
+        stop.set()
+    assert passes and stacks
+    assert profiler._labels == {}
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+import app as app_module
+
+GOOD_SERVICE = {'date': '2025-03-14', 'time': '09:30', 'task_id': 'TASK-001'}
+GOOD_STAFFING = {'date': '2025-03-14', 'section_id': 'SEC-001'}
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def _json_batch(client, path, items):
+    response = client.post(path, json={'items': items})
+    assert response.status_code == 200
+    return response.get_json()['predictions']
+
+
+def _ndjson_batch(client, path, items):
+    body = ''.join(json.dumps(item) + '\n' for item in items)
+    response = client.post(path, data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+@pytest.mark.parametrize('send', [_json_batch, _ndjson_batch])
+@pytest.mark.parametrize('path, good, bad', [
+    ('/predict_service_time/batch', GOOD_SERVICE, {**GOOD_SERVICE, 'task_id': ['TASK-001']}),
+    ('/predict_service_time/batch', GOOD_SERVICE, {**GOOD_SERVICE, 'time': 9}),
+    ('/predict_staffing/batch', GOOD_STAFFING, {**GOOD_STAFFING, 'section_id': {'id': 'SEC-001'}}),
+    ('/predict_staffing/batch', GOOD_STAFFING, {**GOOD_STAFFING, 'date': ['2025-03-14']}),
+])
+def test_bad_field_type_is_an_inline_error(client, send, path, good, bad):
+    predictions = send(client, path, [good, bad, good])
+    assert len(predictions) == 3
+    assert 'error' not in predictions[0] and predictions[0] == predictions[2]
+    assert predictions[1]['code'] == 'invalid_field'
+
+
+@pytest.mark.parametrize('send', [_json_batch, _ndjson_batch])
+def test_non_string_time_matches_single_endpoint(client, send):
+    item = {**GOOD_SERVICE, 'time': 9}
+    single = client.post('/predict_service_time', json=item)
+    assert single.status_code == 400
+    [batch] = send(client, '/predict_service_time/batch', [item])
+    assert batch['code'] == single.get_json()['code']
+    assert batch['field'] == 'time'
+
+
+@pytest.mark.parametrize('send', [_json_batch, _ndjson_batch])
+def test_mixed_service_batch_errors_carry_codes(client, send):
+    items = [GOOD_SERVICE,
+             {**GOOD_SERVICE, 'date': '2025-13-40'},
+             {**GOOD_SERVICE, 'time': 'noon'},
+             {**GOOD_SERVICE, 'task_id': 'TASK-DOES-NOT-EXIST'},
+             'not an object']
+    predictions = send(client, '/predict_service_time/batch', items)
+    assert 'expected_completion_time_minutes' in predictions[0]
+    assert [(p['code'], p.get('field')) for p in predictions[1:]] == [
+        ('invalid_date', 'date'), ('invalid_time', 'time'), ('invalid_task_id', 'task_id'),
+        ('invalid_request_format', None)]
+    for item, batch in zip(items[1:4], predictions[1:4]):
+        single = client.post('/predict_service_time', json=item).get_json()
+        assert (batch['code'], batch['field']) == (single['code'], single['field'])
+
+
+@pytest.mark.parametrize('send', [_json_batch, _ndjson_batch])
+def test_mixed_staffing_batch_errors_carry_codes(client, send):
+    items = [GOOD_STAFFING, {**GOOD_STAFFING, 'date': 'yesterday'}, {**GOOD_STAFFING, 'section_id': 'SEC-999'}]
+    predictions = send(client, '/predict_staffing/batch', items)
+    assert 'predicted_employee_count' in predictions[0]
+    assert [(p['code'], p['field']) for p in predictions[1:]] == [
+        ('invalid_date', 'date'), ('invalid_section_id', 'section_id')]
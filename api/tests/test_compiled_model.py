@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.preprocessing import StandardScaler
+from xgboost import XGBRegressor
+
+import app as app_module
+import generate_outputs as go
+from compiled_model import CompiledEnsemble, check_parity
+
+
+def _cut_point_rows(compiled, base_rows):
+    """Rows that put each split feature exactly on, just below and just above the split's raw cut point."""
+    split = compiled.feature >= 0
+    rows = []
+    for feature, cut in zip(compiled.feature[split], compiled.threshold[split]):
+        for value in (cut, np.nextafter(cut, -np.inf), np.nextafter(cut, np.inf)):
+            row = base_rows[len(rows) % len(base_rows)].copy()
+            row[feature] = value
+            rows.append(row)
+    return np.array(rows)
+
+
+def _assert_parity(compiled, model, scaler, X):
+    expected = model.predict(scaler.transform(X))
+    np.testing.assert_allclose(compiled.predict(X), expected, rtol=0, atol=1e-4)
+    max_diff, rounded = check_parity(compiled, model, scaler, X)
+    assert rounded == 0
+
+
+def _task_rows(task):
+    if task == 'service':
+        bundle = app_module.service_registry.current()
+        chunk = pd.read_csv(os.path.join(go.DATA_DIR, 'task1_test_inputs.csv'), dtype=str, nrows=2000)
+        X, valid = go.service_feature_matrix(chunk, bundle)
+        X = X[valid]
+    else:
+        bundle = app_module.staffing_registry.current()
+        chunk = pd.read_csv(os.path.join(go.DATA_DIR, 'task2_test_inputs.csv'), dtype=str)
+        X, valid = go.staffing_feature_matrix(chunk, go.load_staffing_bundle())
+        X = X[valid]
+    return bundle, np.asarray(X, dtype=float)
+
+
+@pytest.mark.parametrize('task', ['service', 'staffing'])
+def test_shipped_models_match_xgboost(task):
+    bundle, X = _task_rows(task)
+    compiled = CompiledEnsemble.from_xgb(bundle['model'], bundle['scaler'])
+    _assert_parity(compiled, bundle['model'], bundle['scaler'], X)
+    _assert_parity(compiled, bundle['model'], bundle['scaler'], _cut_point_rows(compiled, X))
+
+
+def test_small_booster_matches_on_cut_points_and_after_save(tmp_path):
+    rng = np.random.default_rng(0)
+    X = np.column_stack([rng.integers(0, 24, 500), rng.integers(0, 7, 500), rng.normal(50, 20, 500)]).astype(float)
+    y = X[:, 0] * 2 + np.where(X[:, 1] >= 5, 10, 0) + X[:, 2] * 0.3 + rng.normal(0, 1, 500)
+    scaler = StandardScaler().fit(X)
+    model = XGBRegressor(n_estimators=20, max_depth=4, random_state=0).fit(scaler.transform(X), y)
+    compiled = CompiledEnsemble.from_xgb(model, scaler)
+    cut_rows = _cut_point_rows(compiled, X)
+    _assert_parity(compiled, model, scaler, X)
+    _assert_parity(compiled, model, scaler, cut_rows)
+
+    compiled.save(str(tmp_path / 'compiled_model'))
+    loaded = CompiledEnsemble.load(str(tmp_path / 'compiled_model'))
+    np.testing.assert_array_equal(loaded.predict(cut_rows), compiled.predict(cut_rows))
@@ -0,0 +1,34 @@
+import pytest
+
+import app as app_module
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def test_forecast(client):
+    response = client.post('/forecast_staffing', json={'start_date': '2025-01-01', 'end_date': '2025-01-03'})
+    assert response.status_code == 200
+    assert response.get_json()['dates'] == ['2025-01-01', '2025-01-02', '2025-01-03']
+
+
+@pytest.mark.parametrize('start, end, field', [
+    (5, 6, 'start_date'),
+    ('2025-01-01', 20250103, 'end_date'),
+    ('2025-1-1', '2025-01-03', 'start_date'),
+    ('2025-01-01', '2025-02-30', 'end_date'),
+    ('2025-01-01T00:00', '2025-01-03', 'start_date'),
+])
+def test_dates_must_be_iso_strings(client, start, end, field):
+    response = client.post('/forecast_staffing', json={'start_date': start, 'end_date': end})
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['code'] == 'invalid_date' and body['field'] == field
+
+
+def test_query_string_dates(client):
+    response = client.get('/forecast_staffing?start_date=2025-01-01&end_date=abc')
+    assert response.status_code == 400
+    assert response.get_json()['code'] == 'invalid_date'
@@ -0,0 +1,25 @@
+from hyperparameter_search import promote, rank
+
+
+def _result(candidate, rung, val_mae, p99_ms):
+    return {'candidate': candidate, 'rung': rung, 'val_mae': val_mae, 'single_row_p99_ms': p99_ms}
+
+
+def test_candidate_within_slo_beats_more_accurate_later_rung_candidate():
+    # The most accurate candidate reached the last rung but breaks the 1ms SLO
+    results = [_result(0, 2, 1.0, 5.0), _result(1, 0, 2.0, 0.5), _result(2, 1, 3.0, 0.8)]
+    ranked = rank(results, latency_slo_ms=1.0)
+    assert [r['candidate'] for r in ranked] == [2, 1, 0]
+    assert [r['meets_slo'] for r in ranked] == [True, True, False]
+
+
+def test_without_slo_highest_rung_then_accuracy_wins():
+    results = [_result(0, 2, 1.5, 5.0), _result(1, 0, 1.0, 0.5), _result(2, 2, 1.2, 0.8)]
+    assert [r['candidate'] for r in rank(results)] == [2, 0, 1]
+
+
+def test_promotion_keeps_candidates_within_slo_first():
+    scored = [_result(0, 0, 1.0, 5.0), _result(1, 0, 2.0, 0.5), _result(2, 0, 3.0, 0.8), _result(3, 0, 4.0, 9.0)]
+    assert promote(scored, 2, latency_slo_ms=1.0) == [1, 2]
+    assert promote(scored, 3, latency_slo_ms=1.0) == [1, 2, 0]
+    assert promote(scored, 2) == [0, 1]
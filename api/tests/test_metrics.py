@@ -0,0 +1,23 @@
+from metrics import MetricsRegistry, _labels
+
+
+def test_label_values_are_escaped():
+    assert _labels(path='a\\b', name='say "hi"', text='two\nlines') == \
+        'path="a\\\\b",name="say \\"hi\\"",text="two\\nlines"'
+
+
+def test_rendered_info_labels_stay_on_one_line():
+    metrics = MetricsRegistry()
+    metrics.set_info('model_info', 'Loaded model.', [{'version': 'v1"\n\\x'}])
+    line = [l for l in metrics.render().splitlines() if l.startswith('model_info{')]
+    assert line == ['model_info{version="v1\\"\\n\\\\x"} 1']
+
+
+def test_service_time_request_times_each_stage():
+    import app as app_module
+    client = app_module.app.test_client()
+    response = client.post('/predict_service_time', json={'date': '2025-03-14', 'time': '09:30', 'task_id': 'TASK-001'})
+    assert response.status_code == 200
+    text = client.get('/metrics').get_data(as_text=True)
+    for stage in ('json_parse', 'lookup', 'date_parse', 'encode'):
+        assert f'prediction_stage_seconds_count{{endpoint="predict_service_time",stage="{stage}"}}' in text
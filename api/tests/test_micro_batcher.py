@@ -0,0 +1,44 @@
+import threading
+
+from micro_batcher import MicroBatcher
+from metrics import MetricsRegistry
+
+
+def _double(bundle, rows):
+    return [row * 2 for row in rows]
+
+
+def test_submit_starts_the_worker_when_it_was_never_started():
+    batcher = MicroBatcher(_double, window_ms=1)
+    assert batcher.submit(None, 21) == 42
+    assert batcher._thread.is_alive()
+    assert batcher.fallbacks == 0
+
+
+def test_stuck_worker_falls_back_to_direct_scoring():
+    release = threading.Event()
+
+    def slow_then_double(bundle, rows):
+        if threading.current_thread().name == 'micro-batcher':
+            release.wait(5)
+        return _double(bundle, rows)
+
+    batcher = MicroBatcher(slow_then_double, window_ms=1, timeout_ms=50)
+    try:
+        assert batcher.submit(None, 5) == 10
+        assert batcher.fallbacks == 1
+    finally:
+        release.set()
+
+
+def test_worker_survives_errors_outside_the_score_call():
+    class BrokenMetrics(MetricsRegistry):
+        def observe(self, name, value):
+            raise RuntimeError('metrics backend down')
+
+    batcher = MicroBatcher(_double, window_ms=1, metrics=BrokenMetrics(), timeout_ms=2000)
+    batcher.start()
+    for value in range(5):
+        assert batcher.submit(None, value) == value * 2
+    assert batcher._thread.is_alive()
+    assert batcher.fallbacks == 0
@@ -0,0 +1,48 @@
+import datetime
+import shutil
+
+import pytest
+
+from model_predictor import ServiceCompletionTimePredictor
+
+HEADER = 'date,section_id,employees_on_duty,total_task_time_minutes\n'
+
+
+@pytest.fixture
+def datasets(tmp_path):
+    shutil.copy('datasets/tasks.csv', tmp_path / 'tasks.csv')
+    return tmp_path
+
+
+def _write(datasets, text, mode='w'):
+    with open(datasets / 'staffing_train.csv', mode) as f:
+        f.write(text)
+
+
+def test_unterminated_last_line_is_indexed_once_its_newline_arrives(datasets):
+    _write(datasets, HEADER + '2025-01-01,SEC-001,3,90\n2025-01-02,SEC-001,4,120')
+    predictor = ServiceCompletionTimePredictor(datasets_dir=str(datasets))
+    assert predictor.staffing_index.get(datetime.date(2025, 1, 1), 'SEC-001') == (3, 90)
+    assert predictor.staffing_index.get(datetime.date(2025, 1, 2), 'SEC-001') is None
+    assert predictor.refresh_staffing() == 0
+
+    _write(datasets, '\n2025-01-03,SEC-001,5,150\n', 'a')
+    assert predictor.refresh_staffing() == 2
+    assert predictor.staffing_index.get(datetime.date(2025, 1, 2), 'SEC-001') == (4, 120)
+    assert predictor.staffing_index.get(datetime.date(2025, 1, 3), 'SEC-001') == (5, 150)
+
+
+def test_line_still_being_written_is_not_served_until_complete(datasets):
+    _write(datasets, HEADER + '2025-01-01,SEC-001,1')
+    predictor = ServiceCompletionTimePredictor(datasets_dir=str(datasets))
+    day = datetime.date(2025, 1, 1)
+    assert predictor.staffing_index.get(day, 'SEC-001') is None
+
+    # Every field is present but the last one is still being written
+    _write(datasets, ',9', 'a')
+    assert predictor.refresh_staffing() == 0
+    assert predictor.staffing_index.get(day, 'SEC-001') is None
+
+    _write(datasets, '0\n', 'a')
+    assert predictor.refresh_staffing() == 1
+    assert predictor.staffing_index.get(day, 'SEC-001') == (1, 90)
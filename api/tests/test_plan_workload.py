@@ -0,0 +1,57 @@
+import pytest
+
+import app as app_module
+
+BOOKINGS = [{'date': '2025-03-14', 'time': '09:30', 'task_id': 'TASK-001'},
+            {'date': '2025-03-14', 'time': '10:15', 'task_id': 'TASK-002'}]
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def test_plan(client):
+    response = client.post('/plan_workload?under=1.2', json={'bookings': BOOKINGS, 'over': 0.4})
+    assert response.status_code == 200
+    assert response.get_json()['skipped_bookings'] == 0
+
+
+@pytest.mark.parametrize('url, body', [
+    ('/plan_workload?under=abc', {'bookings': BOOKINGS}),
+    ('/plan_workload', {'bookings': BOOKINGS, 'over': 'abc'}),
+    ('/plan_workload', {'bookings': BOOKINGS, 'over': [0.5]}),
+])
+def test_non_numeric_threshold_is_a_400(client, url, body):
+    response = client.post(url, json=body)
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['code'] == 'invalid_field'
+    assert body['field'] in ('under', 'over')
+
+
+def test_empty_csv_body_is_a_400(client):
+    response = client.post('/plan_workload', data='', content_type='text/csv')
+    assert response.status_code == 400
+    assert response.get_json()['code'] == 'invalid_request_format'
+
+
+def test_csv_body(client):
+    csv = 'date,time,task_id\n' + ''.join(f"{b['date']},{b['time']},{b['task_id']}\n" for b in BOOKINGS)
+    response = client.post('/plan_workload?format=csv', data=csv, content_type='text/csv')
+    assert response.status_code == 200
+    assert response.get_data(as_text=True).startswith('date,section_id,hour')
+
+
+@pytest.mark.parametrize('body', [
+    [1, 2],
+    {'bookings': ['2025-03-14']},
+    {'bookings': [BOOKINGS[0], {'date': '2025-03-14', 'time': 930, 'task_id': 'TASK-001'}]},
+    {'bookings': [{'date': '2025-03-14', 'time': '09:30'}]},
+])
+def test_malformed_bookings_are_a_400(client, body):
+    response = client.post('/plan_workload', json=body)
+    assert response.status_code == 400
+    body = response.get_json()
+    assert body['code'] == 'invalid_request_format'
+    assert body['field'] == 'bookings'
@@ -0,0 +1,47 @@
+import pytest
+
+import app as app_module
+from prediction_cache import PredictionCache
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def test_single_predictions_go_through_the_cache_by_default(client):
+    assert not app_module.SERVICE_TIME_GRID
+    assert not client.get('/health').get_json()['service_time_grid']
+    app_module.prediction_cache.clear()
+    before = client.get('/cache/stats').get_json()
+    payload = {'date': '2025-03-14', 'time': '09:30', 'task_id': 'TASK-001'}
+    first = client.post('/predict_service_time', json=payload).get_json()
+    second = client.post('/predict_service_time', json=payload).get_json()
+    assert first == second
+    stats = client.get('/cache/stats').get_json()
+    assert stats['misses'] - before['misses'] == 1
+    assert stats['hits'] - before['hits'] == 1
+    assert stats['model_version'] == app_module.service_registry.version
+
+
+def test_hot_swap_does_not_clear_the_cache():
+    cache = PredictionCache(maxsize=10)
+    cache.put(('row',), 10, 'v1')
+    cache.put(('row',), 12, 'v2')
+    # In-flight old-version and new requests alternate while the swap settles
+    for _ in range(3):
+        assert cache.get(('row',), 'v1') == 10
+        assert cache.get(('row',), 'v2') == 12
+        cache.put(('other',), 1, 'v1')
+    stats = cache.stats()
+    assert stats['hits'] == 6 and stats['misses'] == 0
+    assert stats['invalidations'] == 1 and stats['model_version'] == 'v2'
+
+
+def test_old_version_entries_age_out():
+    cache = PredictionCache(maxsize=2)
+    cache.put(('a',), 1, 'v1')
+    cache.put(('a',), 2, 'v2')
+    cache.put(('b',), 3, 'v2')
+    assert cache.get(('a',), 'v1') is None
+    assert cache.get(('a',), 'v2') == 2
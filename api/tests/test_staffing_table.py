@@ -0,0 +1,26 @@
+import app as app_module
+from staffing_table import build_staffing_table, check_staffing_table
+
+
+def _bundle():
+    return app_module.staffing_registry.current()
+
+
+def test_table_matches_single_row_predictions():
+    bundle = _bundle()
+    table = build_staffing_table(bundle['model'], bundle['scaler'], bundle['le_section'])
+    assert check_staffing_table(table, bundle['model'], bundle['scaler'], bundle['le_section'],
+                                sample_size=len(table)) == []
+
+
+def test_wrong_missing_and_extra_entries_are_reported():
+    bundle = _bundle()
+    table = build_staffing_table(bundle['model'], bundle['scaler'], bundle['le_section'])
+    wrong, missing = sorted(table)[:2]
+    table[wrong] += 1
+    live = table.pop(missing)
+    table[(13, 0, 'SEC-XXX')] = 1
+    mismatches = check_staffing_table(table, bundle['model'], bundle['scaler'], bundle['le_section'],
+                                      sample_size=len(table))
+    assert sorted(mismatches) == sorted([(wrong, table[wrong], table[wrong] - 1), (missing, None, live),
+                                         ((13, 0, 'SEC-XXX'), 1, None)])
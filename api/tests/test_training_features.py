@@ -0,0 +1,28 @@
+from training_features import STAFFING_FILE, materialize
+
+HEADER = 'date,section_id,employees_on_duty,total_task_time_minutes\n'
+
+
+def _write(data_dir, text, mode='w'):
+    with open(data_dir / STAFFING_FILE, mode) as f:
+        f.write(text)
+
+
+def test_appended_rows_are_added_incrementally(tmp_path):
+    _write(tmp_path, HEADER + '2025-01-01,SEC-001,3,90\n')
+    materialize('staffing', data_dir=str(tmp_path), cache_dir=str(tmp_path / 'cache'))
+    _write(tmp_path, '2025-01-02,SEC-001,4,120\n', 'a')
+    df, status = materialize('staffing', data_dir=str(tmp_path), cache_dir=str(tmp_path / 'cache'))
+    assert status == 'incremental'
+    assert df['employees_on_duty'].tolist() == [3, 4]
+
+
+def test_cached_last_row_without_newline_is_not_merged_with_appended_rows(tmp_path):
+    _write(tmp_path, HEADER + '2025-01-01,SEC-001,3,90\n2025-01-02,SEC-001,4,12')
+    materialize('staffing', data_dir=str(tmp_path), cache_dir=str(tmp_path / 'cache'))
+    # The writer finishes the last row and appends another
+    _write(tmp_path, '0\n2025-01-03,SEC-002,5,150\n', 'a')
+    df, status = materialize('staffing', data_dir=str(tmp_path), cache_dir=str(tmp_path / 'cache'))
+    assert status == 'rebuilt'
+    assert df['employees_on_duty'].tolist() == [3, 4, 5]
+    assert df['section_id'].astype(str).tolist() == ['SEC-001', 'SEC-001', 'SEC-002']
@@ -1,3 +1,4 @@
+import argparse
 import os
 import pandas as pd
 import numpy as np
@@ -6,77 +7,95 @@ from xgboost import XGBRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error
 import joblib
+from model_registry import new_version_dir, activate_version
+from compiled_model import compile_and_save
+from feature_pipeline import FeaturePipeline
+from service_grid import build_service_grid, save_service_grid
+import hyperparameter_search
+from training_features import load_service_features
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, 'datasets')
-MODEL_DIR = os.path.join(BASE_DIR, '../Model/Tast1')
-os.makedirs(MODEL_DIR, exist_ok=True)
+TASK_DIR = os.path.join(BASE_DIR, '../Model/Tast1')
+TASKS_FILE = os.path.join(BASE_DIR, 'datasets', 'tasks.csv')
 
-# Load datasets
-booking = pd.read_csv(os.path.join(DATA_DIR, 'bookings_train.csv'), parse_dates=['booking_date','appointment_date','check_in_time','check_out_time'])
-task = pd.read_csv(os.path.join(DATA_DIR, 'tasks.csv'))
-staff = pd.read_csv(os.path.join(DATA_DIR, 'staffing_train.csv'), parse_dates=['date'])
 
-# Merge datasets
-# Booking + Task
-booking = booking.merge(task[['task_id','section_id']], on='task_id', how='left')
-# Booking + Staff (via date and section_id)
-df = booking.merge(staff, left_on=['appointment_date','section_id'], right_on=['date','section_id'], how='left')
+def main():
+    parser = argparse.ArgumentParser(description='Train the Task 1 service completion time model.')
+    hyperparameter_search.add_arguments(parser)
+    args = parser.parse_args()
 
-# Compute target
-df['completion_time_minutes'] = (df['check_out_time'] - df['check_in_time']).dt.total_seconds() / 60
-df = df.dropna(subset=['completion_time_minutes'])
-df = df[df['completion_time_minutes'] > 0]
+    os.makedirs(TASK_DIR, exist_ok=True)
+    # Artifacts go to a new versioned directory; the API hot-reloads it once it is activated
+    MODEL_VERSION, MODEL_DIR = new_version_dir(TASK_DIR)
 
-# Feature engineering
-df['appointment_hour'] = df['appointment_time'].str.split(':').str[0].astype(int)
-df['appointment_weekday'] = df['appointment_date'].dt.weekday
-df['month'] = df['appointment_date'].dt.month
+    # Load the merged, feature-engineered bookings table (cached; only new or appended CSV rows are processed)
+    df = load_service_features()
 
-# Encode categorical features
-le_task = LabelEncoder()
-df['task_id_encoded'] = le_task.fit_transform(df['task_id'])
-le_section = LabelEncoder()
-df['section_id_encoded'] = le_section.fit_transform(df['section_id'])
+    # Encode categorical features
+    le_task = LabelEncoder()
+    df['task_id_encoded'] = le_task.fit_transform(df['task_id'])
+    le_section = LabelEncoder()
+    df['section_id_encoded'] = le_section.fit_transform(df['section_id'])
 
-# Staff load ratio (total_task_time_minutes / employees_on_duty)
-df['staff_load_ratio'] = df['total_task_time_minutes'] / df['employees_on_duty']
-df['staff_load_ratio'] = df['staff_load_ratio'].fillna(df['staff_load_ratio'].mean())
-df['employees_on_duty'] = df['employees_on_duty'].fillna(df['employees_on_duty'].mean())
+    # Staff load ratio (total_task_time_minutes / employees_on_duty)
+    df['staff_load_ratio'] = df['total_task_time_minutes'] / df['employees_on_duty']
+    df['staff_load_ratio'] = df['staff_load_ratio'].fillna(df['staff_load_ratio'].mean())
+    df['employees_on_duty'] = df['employees_on_duty'].fillna(df['employees_on_duty'].mean())
 
-# Features and target
-features = [
-    'appointment_hour',
-    'appointment_weekday',
-    'month',
-    'task_id_encoded',
-    'section_id_encoded',
-    'staff_load_ratio',
-    'employees_on_duty',
-]
-X = df[features]
-y = df['completion_time_minutes']
+    # Features and target
+    features = [
+        'appointment_hour',
+        'appointment_weekday',
+        'month',
+        'task_id_encoded',
+        'section_id_encoded',
+        'staff_load_ratio',
+        'employees_on_duty',
+    ]
+    X = df[features]
+    y = df['completion_time_minutes']
 
-# Scale features
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
+    # Scale features
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
 
-# Train/test split
-X_train, X_test, y_train, y_test = train_test_split(X_scaled, y, test_size=0.2, random_state=42)
+    # Train/test split
+    X_train, X_test, y_train, y_test = train_test_split(X_scaled, y, test_size=0.2, random_state=42)
 
-# Train XGBoost regressor
-model = XGBRegressor(n_estimators=100, max_depth=5, random_state=42)
-model.fit(X_train, y_train)
+    # Train XGBoost regressor
+    if args.tune:
+        # Parallel successive-halving search on a validation split of the training data
+        params = hyperparameter_search.tune(args, X_train, y_train, (MODEL_DIR, TASK_DIR))
+    else:
+        params = {'n_estimators': 100, 'max_depth': 5}
+    model = XGBRegressor(random_state=42, **params)
+    model.fit(X_train, y_train)
 
-# Evaluate
-y_pred = model.predict(X_test)
-mae = mean_absolute_error(y_test, y_pred)
-print(f"Test MAE: {mae:.2f} minutes")
+    # Evaluate
+    y_pred = model.predict(X_test)
+    mae = mean_absolute_error(y_test, y_pred)
+    print(f"Test MAE: {mae:.2f} minutes")
+    for metrics_dir in (MODEL_DIR, TASK_DIR):
+        with open(os.path.join(metrics_dir, 'model_metrics.txt'), 'w') as f:
+            f.write(f"Test MAE: {mae:.2f} minutes\n")
 
-# Save model and encoders
-joblib.dump(model, os.path.join(MODEL_DIR, 'xgb_service_completion_model.pkl'))
-joblib.dump(scaler, os.path.join(MODEL_DIR, 'scaler.pkl'))
-joblib.dump(le_task, os.path.join(MODEL_DIR, 'task_label_encoder.pkl'))
-joblib.dump(le_section, os.path.join(MODEL_DIR, 'section_label_encoder.pkl'))
-print(f"Model and encoders saved to {MODEL_DIR}")
+    # Save model and encoders
+    joblib.dump(model, os.path.join(MODEL_DIR, 'xgb_service_completion_model.pkl'))
+    joblib.dump(scaler, os.path.join(MODEL_DIR, 'scaler.pkl'))
+    joblib.dump(le_task, os.path.join(MODEL_DIR, 'task_label_encoder.pkl'))
+    joblib.dump(le_section, os.path.join(MODEL_DIR, 'section_label_encoder.pkl'))
+    # Flat NumPy export of the trees with the scaler folded in, checked against model.predict
+    compile_and_save(model, scaler, MODEL_DIR, X_check=X.to_numpy(dtype=float))
+    # Every placeholder-feature prediction the API can serve, as an (hour, weekday, month, task) array
+    features = FeaturePipeline.from_encoders(pd.read_csv(TASKS_FILE), le_task, le_section)
+    service_grid = build_service_grid(model, scaler, features)
+    save_service_grid(service_grid, features, MODEL_DIR)
+    print(f"Service time grid {service_grid.shape} ({service_grid.nbytes / 1024:.0f}KB) saved")
+    activate_version(TASK_DIR, MODEL_VERSION)
+    print(f"Model and encoders saved to {TASK_DIR} as active version {MODEL_VERSION}")
+
+
+if __name__ == '__main__':
+    # The guard keeps --tune worker processes from re-running training when they import this script
+    main()
@@ -1,3 +1,4 @@
+import argparse
 import os
 import pandas as pd
 import numpy as np
@@ -6,44 +7,71 @@ from xgboost import XGBRegressor
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error
 import joblib
+from model_registry import new_version_dir, activate_version
+from compiled_model import compile_and_save
+import hyperparameter_search
+from training_features import load_staffing_features
+from staffing_table import build_staffing_table, check_staffing_table, save_staffing_table
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, 'datasets')
-MODEL_DIR = os.path.join(BASE_DIR, '../Model/Task2')
-os.makedirs(MODEL_DIR, exist_ok=True)
-
-# Load datasets
-staff = pd.read_csv(os.path.join(DATA_DIR, 'staffing_train.csv'), parse_dates=['date'])
-task = pd.read_csv(os.path.join(DATA_DIR, 'tasks.csv'))
-
-# Merge section info if needed
-# (section_id is already in staff)
-
-# Feature engineering
-staff['date'] = pd.to_datetime(staff['date'])
-staff['month'] = staff['date'].dt.month
-staff['weekday'] = staff['date'].dt.weekday
-le_section = LabelEncoder()
-staff['section_id_encoded'] = le_section.fit_transform(staff['section_id'])
-
-features = [
-    'month',
-    'weekday',
-    'section_id_encoded',
-]
-X = staff[features]
-y = staff['employees_on_duty']
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
-X_train, X_test, y_train, y_test = train_test_split(X_scaled, y, test_size=0.2, random_state=42)
-model = XGBRegressor(n_estimators=100, max_depth=5, random_state=42)
-model.fit(X_train, y_train)
-y_pred = model.predict(X_test)
-mae = mean_absolute_error(y_test, y_pred)
-with open(os.path.join(MODEL_DIR, 'model_metrics.txt'), 'w') as f:
-    f.write(f"Test MAE: {mae:.2f} employees\n")
-joblib.dump(model, os.path.join(MODEL_DIR, 'xgb_staffing_model.pkl'))
-joblib.dump(scaler, os.path.join(MODEL_DIR, 'scaler.pkl'))
-joblib.dump(le_section, os.path.join(MODEL_DIR, 'section_label_encoder.pkl'))
-print(f"Staffing model and encoders saved to {MODEL_DIR}")
+TASK_DIR = os.path.join(BASE_DIR, '../Model/Task2')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the Task 2 staffing model.')
+    hyperparameter_search.add_arguments(parser)
+    args = parser.parse_args()
+
+    os.makedirs(TASK_DIR, exist_ok=True)
+    # Artifacts go to a new versioned directory; the API hot-reloads it once it is activated
+    MODEL_VERSION, MODEL_DIR = new_version_dir(TASK_DIR)
+
+    # Load the feature-engineered staffing table (cached; only new or appended CSV rows are processed)
+    staff = load_staffing_features()
+    le_section = LabelEncoder()
+    staff['section_id_encoded'] = le_section.fit_transform(staff['section_id'])
+
+    features = [
+        'month',
+        'weekday',
+        'section_id_encoded',
+    ]
+    X = staff[features]
+    y = staff['employees_on_duty']
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    X_train, X_test, y_train, y_test = train_test_split(X_scaled, y, test_size=0.2, random_state=42)
+    if args.tune:
+        # Parallel successive-halving search on a validation split of the training data
+        params = hyperparameter_search.tune(args, X_train, y_train, (MODEL_DIR, TASK_DIR))
+    else:
+        params = {'n_estimators': 100, 'max_depth': 5}
+    model = XGBRegressor(random_state=42, **params)
+    model.fit(X_train, y_train)
+    y_pred = model.predict(X_test)
+    mae = mean_absolute_error(y_test, y_pred)
+    for metrics_dir in (MODEL_DIR, TASK_DIR):
+        with open(os.path.join(metrics_dir, 'model_metrics.txt'), 'w') as f:
+            f.write(f"Test MAE: {mae:.2f} employees\n")
+    joblib.dump(model, os.path.join(MODEL_DIR, 'xgb_staffing_model.pkl'))
+    joblib.dump(scaler, os.path.join(MODEL_DIR, 'scaler.pkl'))
+    joblib.dump(le_section, os.path.join(MODEL_DIR, 'section_label_encoder.pkl'))
+
+    # Precompute every (month, weekday, section_id) prediction for the API and verify every entry
+    # against single-row model calls
+    staffing_table = build_staffing_table(model, scaler, le_section)
+    mismatches = check_staffing_table(staffing_table, model, scaler, le_section, sample_size=len(staffing_table))
+    if mismatches:
+        raise RuntimeError(f"Staffing table does not match the model: {mismatches[:5]}")
+    save_staffing_table(staffing_table, MODEL_DIR)
+    print(f"Staffing forecast table with {len(staffing_table)} entries saved")
+    # Flat NumPy export of the trees with the scaler folded in, checked against model.predict
+    compile_and_save(model, scaler, MODEL_DIR, X_check=X.to_numpy(dtype=float))
+    activate_version(TASK_DIR, MODEL_VERSION)
+    print(f"Staffing model and encoders saved to {TASK_DIR} as active version {MODEL_VERSION}")
+
+
+if __name__ == '__main__':
+    # The guard keeps --tune worker processes from re-running training when they import this script
+    main()
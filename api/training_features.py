@@ -0,0 +1,300 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Materialized, feature-engineered training tables shared by both training scripts.
+#
+# Each stage (service, staffing) is stored as one .npz file: numeric and datetime columns as
+# plain arrays, categorical columns as int codes plus their categories. The manifest inside the
+# file records the size and SHA-256 of every source CSV it was built from, so the table is reused
+# as long as the sources are unchanged. When a source only grew (its old bytes hash to the
+# recorded digest), just the appended rows are parsed and engineered and added to the table.
+# Any other change rebuilds the stage from scratch.
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, 'datasets')
+FEATURE_CACHE_DIR = os.path.join(DATA_DIR, 'feature_cache')
+BOOKINGS_FILE = 'bookings_train.csv'
+TASKS_FILE = 'tasks.csv'
+STAFFING_FILE = 'staffing_train.csv'
+
+# Bump when the engineered columns change so existing caches are rebuilt
+SCHEMA_VERSION = 1
+_HASH_BLOCK = 1 << 20
+
+
+def file_digest(path, prefix_size=None):
+    """
+    Returns (size, sha256, prefix_sha256) for a file in a single pass. prefix_sha256 is the
+    digest of its first prefix_size bytes, or None when no prefix is requested or the file is shorter.
+    """
+    full = hashlib.sha256()
+    prefix_hash = None
+    read = 0
+    with open(path, 'rb') as f:
+        if prefix_size is not None:
+            while read < prefix_size:
+                block = f.read(min(_HASH_BLOCK, prefix_size - read))
+                if not block:
+                    break
+                full.update(block)
+                read += len(block)
+            if read == prefix_size:
+                prefix_hash = full.copy().hexdigest()
+        for block in iter(lambda: f.read(_HASH_BLOCK), b''):
+            full.update(block)
+            read += len(block)
+    return read, full.hexdigest(), prefix_hash
+
+
+def _ends_line(path, offset):
+    """True when the byte before offset is a newline, i.e. rows read from offset start on a new line."""
+    with open(path, 'rb') as f:
+        f.seek(offset - 1)
+        return f.read(1) == b'\n'
+
+
+def _read_tail(path, offset, **read_csv_kwargs):
+    """Reads the CSV rows after byte offset, which must start a line (see _ends_line), using the file's header for column names."""
+    with open(path, 'rb') as f:
+        columns = f.readline().decode().strip().split(',')
+        f.seek(offset)
+        data = f.read()
+    if not data.strip():
+        return pd.DataFrame(columns=columns)
+    return pd.read_csv(io.BytesIO(data), names=columns, header=None, **read_csv_kwargs)
+
+
+def _parse_dates(values):
+    """Parses a column of date strings once per distinct value."""
+    codes, uniques = pd.factorize(values)
+    return pd.Series(pd.to_datetime(uniques).take(codes), index=values.index)
+
+
+def save_frame(path, df, manifest):
+    """Writes df to a compressed .npz (atomically), keeping categorical columns as codes + categories."""
+    arrays = {}
+    columns = []
+    for name in df.columns:
+        column = df[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            arrays[f"codes__{name}"] = column.cat.codes.to_numpy()
+            arrays[f"categories__{name}"] = np.asarray(column.cat.categories, dtype=str)
+            columns.append([name, 'category'])
+        else:
+            arrays[f"values__{name}"] = column.to_numpy()
+            columns.append([name, 'values'])
+    arrays['__manifest__'] = np.array(json.dumps(dict(manifest, columns=columns)))
+    tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez_compressed(tmp_path, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_frame(path):
+    """Returns (df, manifest) for a file written by save_frame, or (None, None) if it is missing or unreadable."""
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            manifest = json.loads(str(data['__manifest__']))
+            columns = {}
+            for name, kind in manifest['columns']:
+                if kind == 'category':
+                    columns[name] = pd.Categorical.from_codes(data[f"codes__{name}"], data[f"categories__{name}"].astype(object))
+                else:
+                    columns[name] = data[f"values__{name}"]
+    except (OSError, ValueError, KeyError):
+        return None, None
+    return pd.DataFrame(columns), manifest
+
+
+def _append(old, new):
+    """Concatenates two stage tables, merging the categories of categorical columns."""
+    df = pd.concat([old, new], ignore_index=True)
+    for name in old.columns:
+        if isinstance(old[name].dtype, pd.CategoricalDtype):
+            categories = old[name].cat.categories.union(new[name].astype(object).dropna().unique())
+            df[name] = pd.Categorical(pd.concat([old[name].astype(object), new[name].astype(object)], ignore_index=True),
+                                      categories=categories)
+    return df
+
+
+def _as_categories(df, names):
+    for name in names:
+        df[name] = df[name].astype('category')
+    return df
+
+
+# --- Task 1: service completion time -----------------------------------------------------------
+
+SERVICE_COLUMNS = ['appointment_date', 'task_id', 'section_id', 'appointment_hour', 'appointment_weekday', 'month',
+                   'employees_on_duty', 'total_task_time_minutes', 'staff_matched', 'completion_time_minutes']
+
+
+def read_bookings(path, offset=None):
+    """Reads bookings (all of them, or only rows after byte offset) with dates parsed."""
+    if offset is None:
+        bookings = pd.read_csv(path, dtype={'task_id': str, 'appointment_time': str})
+    else:
+        bookings = _read_tail(path, offset, dtype={'task_id': str, 'appointment_time': str})
+    bookings['appointment_date'] = _parse_dates(bookings['appointment_date'])
+    bookings['check_in_time'] = pd.to_datetime(bookings['check_in_time'], format='ISO8601')
+    bookings['check_out_time'] = pd.to_datetime(bookings['check_out_time'], format='ISO8601')
+    return bookings
+
+
+def read_staffing(path, offset=None):
+    staff = pd.read_csv(path) if offset is None else _read_tail(path, offset)
+    staff['date'] = _parse_dates(staff['date'])
+    return staff
+
+
+def service_rows(bookings, tasks, staff):
+    """
+    Merges bookings with their task's section and that day's staffing and engineers the row-level
+    features. Rows without a positive completion time are dropped; dataset-wide steps (label
+    encoding, mean imputation) are left to the trainer.
+    """
+    booking = bookings.merge(tasks[['task_id', 'section_id']], on='task_id', how='left')
+    df = booking.merge(staff, left_on=['appointment_date', 'section_id'], right_on=['date', 'section_id'],
+                       how='left', indicator='_staff')
+    df['completion_time_minutes'] = (df['check_out_time'] - df['check_in_time']).dt.total_seconds() / 60
+    df = df.dropna(subset=['completion_time_minutes'])
+    df = df[df['completion_time_minutes'] > 0].reset_index(drop=True)
+    df['appointment_hour'] = df['appointment_time'].str.split(':').str[0].astype(int)
+    df['appointment_weekday'] = df['appointment_date'].dt.weekday
+    df['month'] = df['appointment_date'].dt.month
+    df['staff_matched'] = (df['_staff'] == 'both').to_numpy()
+    df['employees_on_duty'] = df['employees_on_duty'].astype(float)
+    df['total_task_time_minutes'] = df['total_task_time_minutes'].astype(float)
+    return _as_categories(df[SERVICE_COLUMNS].copy(), ['task_id', 'section_id'])
+
+
+def _build_service(paths):
+    tasks = pd.read_csv(paths[TASKS_FILE])
+    return service_rows(read_bookings(paths[BOOKINGS_FILE]), tasks, read_staffing(paths[STAFFING_FILE]))
+
+
+def _update_service(df, paths, appended):
+    """Adds appended bookings, and staffing days that fill previously unmatched rows."""
+    if TASKS_FILE in appended:
+        return None
+    tasks = pd.read_csv(paths[TASKS_FILE])
+    staff = read_staffing(paths[STAFFING_FILE])
+    if STAFFING_FILE in appended:
+        new_staff = read_staffing(paths[STAFFING_FILE], appended[STAFFING_FILE])
+        keys = pd.MultiIndex.from_frame(staff[['date', 'section_id']])
+        if keys.has_duplicates:
+            # A day/section staffed twice would multiply booking rows; let a full build reproduce that
+            return None
+        unmatched = np.flatnonzero(~df['staff_matched'].to_numpy())
+        if len(unmatched):
+            rows = df.iloc[unmatched][['appointment_date', 'section_id']].astype({'section_id': object})
+            merged = rows.merge(new_staff, left_on=['appointment_date', 'section_id'],
+                                right_on=['date', 'section_id'], how='left', indicator='_staff')
+            hit = (merged['_staff'] == 'both').to_numpy()
+            df = df.copy()
+            for name in ('employees_on_duty', 'total_task_time_minutes'):
+                values = df[name].to_numpy(copy=True)
+                values[unmatched[hit]] = merged[name].to_numpy(dtype=float)[hit]
+                df[name] = values
+            matched = df['staff_matched'].to_numpy(copy=True)
+            matched[unmatched[hit]] = True
+            df['staff_matched'] = matched
+    if BOOKINGS_FILE in appended:
+        new_rows = service_rows(read_bookings(paths[BOOKINGS_FILE], appended[BOOKINGS_FILE]), tasks, staff)
+        df = _append(df, new_rows)
+    return df
+
+
+# --- Task 2: staffing --------------------------------------------------------------------------
+
+STAFFING_COLUMNS = ['date', 'section_id', 'month', 'weekday', 'employees_on_duty']
+
+
+def staffing_rows(staff):
+    staff['month'] = staff['date'].dt.month
+    staff['weekday'] = staff['date'].dt.weekday
+    return _as_categories(staff[STAFFING_COLUMNS].copy(), ['section_id'])
+
+
+def _build_staffing(paths):
+    return staffing_rows(read_staffing(paths[STAFFING_FILE]))
+
+
+def _update_staffing(df, paths, appended):
+    return _append(df, staffing_rows(read_staffing(paths[STAFFING_FILE], appended[STAFFING_FILE])))
+
+
+# name -> (source files, full build, incremental update)
+STAGES = {
+    'service': ((BOOKINGS_FILE, TASKS_FILE, STAFFING_FILE), _build_service, _update_service),
+    'staffing': ((STAFFING_FILE,), _build_staffing, _update_staffing),
+}
+
+
+def materialize(stage, data_dir=DATA_DIR, cache_dir=FEATURE_CACHE_DIR, rebuild=False):
+    """
+    Returns (df, status) for a stage, where status is 'cached', 'incremental' or 'rebuilt'.
+    The stage table is reused, extended or rebuilt according to the source CSV digests.
+    """
+    sources, build, update = STAGES[stage]
+    paths = {name: os.path.join(data_dir, name) for name in sources}
+    cache_path = os.path.join(cache_dir, f"{stage}_features.npz")
+    df, manifest = (None, None) if rebuild else load_frame(cache_path)
+    if manifest is not None and manifest.get('schema') != SCHEMA_VERSION:
+        df = manifest = None
+
+    digests = {}
+    appended = {}
+    changed = False
+    for name in sources:
+        old = manifest['sources'].get(name) if manifest else None
+        size, sha, prefix_sha = file_digest(paths[name], old['size'] if old else None)
+        digests[name] = {'size': size, 'sha256': sha}
+        if old is None or sha == old['sha256']:
+            changed = changed or old is None
+        elif prefix_sha == old['sha256'] and _ends_line(paths[name], old['size']):
+            appended[name] = old['size']
+        else:
+            changed = True
+
+    if df is not None and not changed and not appended:
+        return df, 'cached'
+    status = 'incremental'
+    if df is not None and not changed:
+        # update() returns None when the appended rows cannot be applied incrementally
+        df = update(df, paths, appended)
+    if df is None or changed:
+        df = build(paths)
+        status = 'rebuilt'
+    os.makedirs(cache_dir, exist_ok=True)
+    save_frame(cache_path, df, {'schema': SCHEMA_VERSION, 'stage': stage, 'sources': digests})
+    return df, status
+
+
+def load_service_features(**kwargs):
+    """Merged, feature-engineered bookings table used by train_service_completion_model.py."""
+    return materialize('service', **kwargs)[0]
+
+
+def load_staffing_features(**kwargs):
+    """Feature-engineered staffing table used by train_staffing_model.py."""
+    return materialize('staffing', **kwargs)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or refresh the cached training feature tables.')
+    parser.add_argument('--stage', choices=['service', 'staffing', 'all'], default='all')
+    parser.add_argument('--rebuild', action='store_true', help='Ignore the cache and rebuild from the CSVs')
+    args = parser.parse_args()
+    for stage in (STAGES if args.stage == 'all' else [args.stage]):
+        start = time.perf_counter()
+        df, status = materialize(stage, rebuild=args.rebuild)
+        print(f"{stage:9s} {status:11s} {len(df):8d} rows  {time.perf_counter() - start:6.2f}s")
+
+
+if __name__ == '__main__':
+    main()
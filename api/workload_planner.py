@@ -0,0 +1,131 @@
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+import generate_outputs as go
+
+# An hour is flagged under-staffed when predicted workload exceeds this share of the predicted
+# staff's minutes, and over-staffed when it falls below the lower share.
+UNDER_STAFFED_UTILIZATION = 1.0
+OVER_STAFFED_UTILIZATION = 0.5
+
+PLAN_COLUMNS = ['date', 'section_id', 'hour', 'bookings', 'workload_minutes', 'predicted_employees',
+                'required_employees', 'utilization', 'status']
+
+
+def _default_predict(bundle):
+    return lambda X: bundle['model'].predict(bundle['scaler'].transform(X))
+
+
+def plan_workload(bookings, service_bundle, staffing_bundle, predict=None,
+                  under=UNDER_STAFFED_UTILIZATION, over=OVER_STAFFED_UTILIZATION):
+    """
+    Predicts per-section, per-hour workload for a list of bookings (date, time, task_id) and
+    compares it with the staffing forecast.
+
+    Bookings are scored twice in vectorized passes. The first pass uses the placeholder staffing
+    features to estimate each section's daily load. The second pass fills employees_on_duty with
+    the staffing forecast and staff_load_ratio with daily load / employees, matching how both
+    features were built for training. Workload is the sum of the second-pass minutes per
+    (date, section, hour). Every section is listed for every hour between the earliest and latest
+    booked hour, so idle hours show up as over-staffed.
+
+    Returns (plan DataFrame with PLAN_COLUMNS, number of bookings that could not be scored).
+    """
+    predict = predict or _default_predict(service_bundle)
+    bookings = bookings.astype({'date': str, 'time': str, 'task_id': str})
+    X, valid = go.service_feature_matrix(bookings, service_bundle)
+    skipped = int((~valid).sum())
+    if not valid.any():
+        return pd.DataFrame(columns=PLAN_COLUMNS), skipped
+
+    # Dates and sections of the scored rows, as dense indexes for bincount
+    # Same memoized calendar as the features, so a booking's day always matches its month and weekday
+    dates = service_bundle['features'].calendar.dates(bookings['date'].to_numpy()[valid])
+    date_codes, date_labels = pd.factorize(dates, sort=True)
+    section_labels = np.array(list(staffing_bundle['section_codes']), dtype=object)
+    staffing_codes = pd.Series(bookings['task_id'].to_numpy()[valid]).map(service_bundle['task_sections']) \
+        .map(staffing_bundle['section_codes']).fillna(-1).to_numpy(dtype=int)
+    # Sections unknown to the staffing model cannot be planned
+    known = staffing_codes >= 0
+    skipped += int((~known).sum())
+    X, date_codes, staffing_codes = X[known], date_codes[known], staffing_codes[known]
+    if not len(X):
+        return pd.DataFrame(columns=PLAN_COLUMNS), skipped
+    hours = X[:, 0].astype(int)
+    n_dates, n_sections = len(date_labels), len(section_labels)
+
+    # Predicted staff per (date, section) from the forecast table
+    employees = staffing_bundle['grid'][date_labels.month.to_numpy() - 1, date_labels.weekday.to_numpy()]
+    day_section = date_codes * n_sections + staffing_codes
+
+    first = np.maximum(1, np.round(predict(X)))
+    daily_load = np.bincount(day_section, weights=first, minlength=n_dates * n_sections)
+    X[:, 6] = employees.ravel()[day_section]
+    X[:, 5] = daily_load[day_section] / X[:, 6]
+    minutes = np.maximum(1, np.round(predict(X)))
+
+    first_hour, last_hour = hours.min(), hours.max()
+    n_hours = last_hour - first_hour + 1
+    cell = day_section * n_hours + (hours - first_hour)
+    size = n_dates * n_sections * n_hours
+    workload = np.bincount(cell, weights=minutes, minlength=size)
+    counts = np.bincount(cell, minlength=size)
+
+    staff = np.repeat(employees.ravel(), n_hours)
+    utilization = workload / (staff * 60.0)
+    status = np.where(utilization > under, 'under_staffed', np.where(utilization < over, 'over_staffed', 'ok'))
+    plan = pd.DataFrame({
+        'date': np.repeat(date_labels.strftime('%Y-%m-%d').to_numpy(), n_sections * n_hours),
+        'section_id': np.tile(np.repeat(section_labels, n_hours), n_dates),
+        'hour': np.tile(np.arange(first_hour, last_hour + 1), n_dates * n_sections),
+        'bookings': counts,
+        'workload_minutes': workload.astype(int),
+        'predicted_employees': staff,
+        'required_employees': np.ceil(workload / 60.0).astype(int),
+        'utilization': np.round(utilization, 3),
+        'status': status,
+    })
+    return plan, skipped
+
+
+def summarize(plan):
+    """Counts of hours per status, plus the flagged (date, section, hour) cells."""
+    flagged = plan[plan['status'] != 'ok']
+    return {
+        'hours': int(len(plan)),
+        'under_staffed': int((plan['status'] == 'under_staffed').sum()),
+        'over_staffed': int((plan['status'] == 'over_staffed').sum()),
+        'flagged': flagged[['date', 'section_id', 'hour', 'status']].to_dict(orient='records'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-section, per-hour workload plan for a list of bookings.')
+    parser.add_argument('input', help='CSV with date, time, task_id columns (e.g. task1_test_inputs.csv)')
+    parser.add_argument('--output', default='workload_plan.csv')
+    parser.add_argument('--date', help='Only plan bookings on this date (YYYY-MM-DD)')
+    parser.add_argument('--under', type=float, default=UNDER_STAFFED_UTILIZATION,
+                        help='Utilization above which an hour is under-staffed')
+    parser.add_argument('--over', type=float, default=OVER_STAFFED_UTILIZATION,
+                        help='Utilization below which an hour is over-staffed')
+    args = parser.parse_args()
+
+    service_bundle = go.load_service_bundle()
+    staffing_bundle = go.load_staffing_bundle()
+    bookings = pd.read_csv(args.input, dtype=str, keep_default_na=False)
+    if args.date:
+        bookings = bookings[bookings['date'] == args.date]
+    start = time.perf_counter()
+    plan, skipped = plan_workload(bookings, service_bundle, staffing_bundle, under=args.under, over=args.over)
+    elapsed = time.perf_counter() - start
+    plan.to_csv(args.output, index=False)
+    summary = summarize(plan)
+    print(f"Planned {len(bookings) - skipped} bookings into {summary['hours']} section-hours in {elapsed * 1000:.1f}ms "
+          f"({skipped} skipped): {summary['under_staffed']} under-staffed, {summary['over_staffed']} over-staffed")
+    print(f"Plan written to {os.path.abspath(args.output)}")
+
+
+if __name__ == '__main__':
+    main()